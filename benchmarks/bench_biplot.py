@@ -0,0 +1,56 @@
+"""
+time and peak memory of biplot and Biplot.select over rows, features,
+mode and backend
+
+asv run -b bench_biplot
+"""
+import numpy as np
+
+import spyglass
+
+class Projector:
+    """PCA stand-in: a random orthonormal basis with decreasing variance"""
+    def __init__(self, n_features:int, n_components:int=10):
+        rng = np.random.default_rng(0)
+        q, _ = np.linalg.qr(rng.normal(size=(n_features, n_components)))
+        self.components_ = q.T
+        self.explained_variance_ = 1 / np.arange(1, n_components + 1)
+        self.n_features_in_ = n_features
+
+    def get_feature_names_out(self):
+        return np.array([f"pca{i}" for i in range(len(self.components_))])
+
+    def transform(self, X):
+        return np.asarray(X) @ self.components_.T
+
+class BiplotSuite:
+    params = ([1_000, 100_000, 1_000_000], [10, 100, 1_000],
+              ["scatter", "density"], ["plotly", "seaborn"])
+    param_names = ["rows", "features", "mode", "backend"]
+    timeout = 600
+
+    def setup(self, rows, features, mode, backend):
+        if mode == "scatter" and rows > 100_000 or rows * features > 100_000_000:
+            raise NotImplementedError #skip
+        import matplotlib
+        matplotlib.use("Agg")
+        spyglass.set_backend(backend)
+        rng = np.random.default_rng(0)
+        self.X = rng.random((rows, features), dtype=np.float32)
+        self.pca = Projector(features)
+        self.biplot = spyglass.Biplot(self.X, self.pca)
+        self.biplot.plot(0, 1, mode=mode)
+
+    def teardown(self, *params):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def time_biplot(self, rows, features, mode, backend):
+        spyglass.biplot(self.X, self.pca, mode=mode)
+
+    def peakmem_biplot(self, rows, features, mode, backend):
+        spyglass.biplot(self.X, self.pca, mode=mode)
+
+    def time_select(self, rows, features, mode, backend):
+        """switching components on a drawn figure"""
+        self.biplot.select(2, 3)
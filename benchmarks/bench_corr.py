@@ -0,0 +1,50 @@
+"""
+time and peak memory of feature correlation maps over the number of
+features, against the dense pandas correlation they replace
+
+asv run -b bench_corr
+"""
+import numpy as np
+import pandas as pd
+
+import spyglass
+
+class Correlation:
+    params = ([200, 1_000, 2_000], [None, .6])
+    param_names = ["features", "threshold"]
+    timeout = 900
+
+    def setup(self, features, threshold):
+        rng = np.random.default_rng(0)
+        rows = 20_000
+        base = rng.normal(size=(rows, 40)).astype(np.float32)
+        noise = rng.normal(0, .5, (rows, features)).astype(np.float32)
+        self.data = pd.DataFrame(base[:, rng.integers(0, 40, features)] + noise,
+                                 columns=[f"f{i}" for i in range(features)])
+
+    def time_correlation(self, features, threshold):
+        spyglass.correlation(self.data, threshold=threshold)
+
+    def peakmem_correlation(self, features, threshold):
+        spyglass.correlation(self.data, threshold=threshold)
+
+    def time_corrmap(self, features, threshold):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots()
+        spyglass.corrmap(self.data, threshold=threshold, ax=ax)
+        fig.canvas.draw()
+        plt.close(fig)
+
+class PandasCorrelation:
+    """the dense float64 matrix of DataFrame.corr, for reference"""
+    params = [200, 1_000]
+    param_names = ["features"]
+    timeout = 900
+
+    def setup(self, features):
+        Correlation.setup(self, features, None)
+
+    def time_corr(self, features):
+        self.data.corr()
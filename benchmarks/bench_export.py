@@ -0,0 +1,100 @@
+"""
+size, encoding time and load time of plotly parity html over the
+number of points and the export encoding
+
+asv run -b bench_export
+
+The load time is measured with node, when it is installed: the data
+scripts of the page are run, until they call a stand-in
+Plotly.newPlot which decodes typed arrays as plotly.js does. It
+covers parsing and decoding the data, not drawing it, and is nan
+without node.
+"""
+import numpy as np
+import pandas as pd
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+import spyglass
+
+ENCODINGS = {
+    "default": {},
+    "float32": {"precision": "float32"},
+    "quantized": {"precision": 16},
+    "shared": {"precision": "float32", "shared_data": True},
+}
+
+LOAD = r"""
+const html = require('fs').readFileSync(process.argv[2], 'utf8');
+const scripts = [...html.matchAll(/<script(?: type="text\/javascript")?>([\s\S]*?)<\/script>/g)].map(m => m[1]);
+const types = {f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array,
+               i1: Int8Array, u4: Uint32Array, u2: Uint16Array, u1: Uint8Array};
+function bytes(s) { //in javascript, as plotly.js and the spyglass loader do
+  const bin = atob(s), out = new Uint8Array(bin.length);
+  for (let i = 0; i < bin.length; i++) out[i] = bin.charCodeAt(i);
+  return out.buffer;
+}
+function decode(o) { //plotly.js decodes typed array specs itself
+  for (const k in o) {
+    const v = o[k];
+    if (v && typeof v == "object" && !ArrayBuffer.isView(v)) {
+      if ("bdata" in v) o[k] = new types[v.dtype](bytes(v.bdata));
+      else decode(v);
+    }
+  }
+}
+global.window = global;
+global.document = {getElementById: () => ({})};
+global.Plotly = {newPlot: (div, data) => {
+  decode(data);
+  console.log(Number(process.hrtime.bigint() - start) / 1e9);
+  return Promise.resolve();
+}};
+const start = process.hrtime.bigint();
+for (const s of scripts) (0, eval)(s); //global scope, as a page runs them
+"""
+
+class PlotlyExport:
+    params = ([10_000, 100_000, 1_000_000], list(ENCODINGS))
+    param_names = ["points", "encoding"]
+    timeout = 600
+
+    def setup(self, points, encoding):
+        rng = np.random.default_rng(0)
+        true = rng.random(points)
+        data = pd.DataFrame({"comparison": pd.Categorical(np.arange(points) % 4),
+                             "true": true, "pred": true + rng.normal(0, .1, points),
+                             "partition": "test"})
+        self.spec = spyglass.FigureSpec("parity", data, x="true", y="pred",
+                                        facet_col="comparison", facet_col_wrap=2)
+        self.figure = self.spec.render("plotly")
+        self.options = dict(ENCODINGS[encoding], include_plotlyjs=False)
+        self.html = self.spec.export("html", backend="plotly", **self.options)
+
+    def time_export(self, points, encoding):
+        """serialize the drawn figure"""
+        from spyglass._fig_library import _load
+        _load("plotly")._export(self.figure, "html", **self.options)
+
+    def track_size(self, points, encoding):
+        """html size without plotly.js"""
+        return len(self.html) / 2**20
+    track_size.unit = "MiB"
+
+    def track_load(self, points, encoding):
+        """seconds to parse and decode the figure data in node"""
+        node = shutil.which("node")
+        if node is None:
+            return float("nan")
+        with tempfile.TemporaryDirectory() as tmp:
+            page, script = os.path.join(tmp, "page.html"), os.path.join(tmp, "load.js")
+            with open(page, "wb") as f:
+                f.write(self.html)
+            with open(script, "w") as f:
+                f.write(LOAD)
+            out = subprocess.run([node, script, page], capture_output=True, text=True, check=True)
+        return float(out.stdout)
+    track_load.unit = "seconds"
@@ -0,0 +1,89 @@
+"""
+time and peak memory of the long-form parity frame builder on
+multi-target outputs, against the stack/concat builder it replaced,
+and of recolumn on repetitive column labels
+
+asv run -b bench_frame
+
+or directly, for a quick reading in this environment:
+python benchmarks/bench_frame.py
+"""
+import numpy as np
+import pandas as pd
+
+from spyglass._utils import _build_frame, recolumn
+
+def _legacy_build_frame(y_preds, y_trues, partitions):
+    """the MultiIndex/stack/concat builder, kept for comparison"""
+    ldata = []
+    for y_pred, y_true, name in zip(y_preds, y_trues, partitions):
+        prednames = [str(c)+"_pred" for c in y_true.columns]
+        mc_ypred = pd.MultiIndex.from_arrays([prednames, ["pred"]*len(prednames)],
+                                             names=["comparison", "xy"])
+        mc_ytrue = pd.MultiIndex.from_arrays([prednames, ["true"]*len(prednames)],
+                                             names=["comparison", "xy"])
+        y_pred = pd.DataFrame(y_pred, columns=mc_ypred, index=y_true.index)
+        y_true = pd.DataFrame(y_true.values, columns=mc_ytrue, index=y_true.index)
+        ldata.append(
+            pd.concat([y_true, y_pred], axis=1).stack("comparison")
+            .reset_index(level='comparison')
+            .assign(partition=name)
+        )
+    return pd.concat(ldata, axis=0)
+
+class BuildFrame:
+    params = ([10_000, 100_000, 1_000_000], [1, 10, 100])
+    param_names = ["rows", "targets"]
+    timeout = 600
+
+    def setup(self, rows, targets):
+        if rows * targets > 20_000_000:
+            raise NotImplementedError #skip, too large for CI machines
+        rng = np.random.default_rng(0)
+        y_true = pd.DataFrame(rng.random((rows, targets)),
+                              columns=[f"t{i}" for i in range(targets)])
+        split = rows * 4 // 5
+        self.args = ([rng.random((split, targets)), rng.random((rows - split, targets))],
+                     [y_true.iloc[:split], y_true.iloc[split:]],
+                     ["train", "test"])
+
+    def time_build_frame(self, rows, targets):
+        _build_frame(*self.args)
+
+    def peakmem_build_frame(self, rows, targets):
+        _build_frame(*self.args)
+
+    def time_legacy_build_frame(self, rows, targets):
+        _legacy_build_frame(*self.args)
+
+    def peakmem_legacy_build_frame(self, rows, targets):
+        _legacy_build_frame(*self.args)
+
+class Recolumn:
+    params = ([100, 10_000, 100_000], [1, 10, 100])
+    param_names = ["columns", "repeats"]
+
+    def setup(self, columns, repeats):
+        self.columns = pd.Index([f"c{i % (columns // repeats)}" for i in range(columns)])
+
+    def time_recolumn(self, columns, repeats):
+        list(recolumn(self.columns))
+
+    def peakmem_recolumn(self, columns, repeats):
+        list(recolumn(self.columns))
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    bench = BuildFrame()
+    for rows, targets in [(1_000_000, 1), (100_000, 100), (1_000_000, 10)]:
+        bench.setup(rows, targets)
+        for builder in (_build_frame, _legacy_build_frame):
+            tracemalloc.start()
+            start = time.perf_counter()
+            builder(*bench.args)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{builder.__name__:20s} rows={rows:>9,d} targets={targets:>3d} "
+                  f"{elapsed:7.3f} s  peak {peak/2**20:8.1f} MiB")
@@ -0,0 +1,50 @@
+"""
+time and peak memory of heatmap and annotate_heatmap over matrix size
+
+asv run -b bench_heatmap
+"""
+import numpy as np
+
+class Heatmap:
+    params = [20, 200, 2_000, 10_000]
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from spyglass.spyglass import heatmap
+        self.data = np.random.default_rng(0).random((size, size))
+        self.labels = [f"f{i}" for i in range(size)]
+        #drawn heatmap to annotate, large enough for the small cases' text
+        self.fig, ax = plt.subplots(figsize=(12, 12))
+        self.im, _ = heatmap(self.data, self.labels, self.labels, ax=ax)
+
+    def teardown(self, size):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def _heatmap(self):
+        import matplotlib.pyplot as plt
+        from spyglass.spyglass import heatmap
+        fig, ax = plt.subplots()
+        heatmap(self.data, self.labels, self.labels, ax=ax)
+        fig.canvas.draw()
+
+    def time_heatmap(self, size):
+        self._heatmap()
+
+    def peakmem_heatmap(self, size):
+        self._heatmap()
+
+    def time_annotate_heatmap(self, size):
+        from spyglass.spyglass import annotate_heatmap
+        annotate_heatmap(self.im, skip_small=True)
+
+    def time_annotate_heatmap_all(self, size):
+        """formatting every cell, however small"""
+        from spyglass.spyglass import annotate_heatmap
+        if size > 200:
+            raise NotImplementedError #skip, one Text per cell
+        annotate_heatmap(self.im, skip_small=False)
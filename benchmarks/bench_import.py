@@ -0,0 +1,50 @@
+"""
+import time of spyglass
+
+run with asv, e.g. compare against the commit before lazy backends:
+asv continuous HEAD~1 HEAD -b bench_import
+
+or run directly for a quick reading in this environment:
+python benchmarks/bench_import.py
+"""
+import subprocess
+import sys
+import time
+
+def timeraw_import_spyglass():
+    """plotting libraries are no longer imported"""
+    return "import spyglass"
+
+def timeraw_import_spyglass_explicit_backend():
+    """no search for installed plotting libraries"""
+    return """
+    import os
+    os.environ['SPYGLASS_BACKEND'] = 'plotly'
+    import spyglass
+    spyglass.get_backend()
+    """
+
+def timeraw_import_spyglass_eager():
+    """the old cost: backend resolved and imported with spyglass"""
+    return """
+    import spyglass
+    spyglass._fig_library._load()
+    """
+
+def _measure(code, repeat=5):
+    """best of repeat wall times for code in a fresh interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    import textwrap
+    baseline = _measure("pass")
+    for bench in (timeraw_import_spyglass,
+                  timeraw_import_spyglass_explicit_backend,
+                  timeraw_import_spyglass_eager):
+        cost = _measure(textwrap.dedent(bench())) - baseline
+        print(f"{bench.__name__:45s} {cost*1e3:8.1f} ms")
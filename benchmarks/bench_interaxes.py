@@ -0,0 +1,43 @@
+"""
+time and peak memory of Interaxes point indexing and click annotation
+over the number of points
+
+asv run -b bench_interaxes
+"""
+import numpy as np
+
+class InteraxesPick:
+    params = [1_000, 100_000, 1_000_000]
+    param_names = ["points"]
+    timeout = 300
+
+    def setup(self, points):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from matplotlib.backend_bases import MouseEvent
+        import spyglass.EDA
+        rng = np.random.default_rng(0)
+        self.xy = rng.random((points, 2))
+        self.labels = [f"instance #{i}" for i in range(points)]
+        self.fig, self.ax = plt.subplots(FigureClass=spyglass.EDA.EDAFigure,
+                                         subplot_kw={'projection': 'interactive'})
+        self.ax.activescatter(self.xy[:, 0], self.xy[:, 1], self.labels)
+        self.fig.canvas.draw()
+        px, py = self.ax.transData.transform(self.xy[points // 2])
+        self.click = MouseEvent("button_press_event", self.fig.canvas, px, py, button=1)
+
+    def teardown(self, points):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def time_indexpoints(self, points):
+        self.ax.indexpoints(self.xy[:, 0], self.xy[:, 1], self.labels)
+
+    def peakmem_indexpoints(self, points):
+        self.ax.indexpoints(self.xy[:, 0], self.xy[:, 1], self.labels)
+
+    def time_click(self, points):
+        """annotate the points under a click and blit them"""
+        self.click._process()
+        self.ax.make_onclickclear()(None)
@@ -0,0 +1,48 @@
+"""
+time and peak memory of parityplot over rows, targets, mode and backend
+
+asv run -b bench_parity
+"""
+import numpy as np
+import pandas as pd
+
+import spyglass
+
+class Doubler:
+    """cheap stand-in regressor, so the plotting path dominates"""
+    def predict(self, X):
+        return 2 * np.asarray(X)
+
+class ParityPlot:
+    params = ([1_000, 10_000, 100_000, 1_000_000], [1, 10],
+              ["scatter", "density"], ["plotly", "seaborn"])
+    param_names = ["rows", "targets", "mode", "backend"]
+    timeout = 600
+
+    def setup(self, rows, targets, mode, backend):
+        if mode == "scatter" and rows * targets > 100_000:
+            raise NotImplementedError #skip, one marker per point is not viable
+        import matplotlib
+        matplotlib.use("Agg")
+        spyglass.set_backend(backend)
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.random((rows, targets)),
+                         columns=[f"t{i}" for i in range(targets)])
+        split = rows * 4 // 5
+        self.args = (Doubler(),
+                     X.iloc[:split], 2 * X.iloc[:split], "train",
+                     X.iloc[split:], 2 * X.iloc[split:], "test")
+
+    def teardown(self, *params):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def time_parityplot(self, rows, targets, mode, backend):
+        spyglass.parityplot(*self.args, mode=mode)
+
+    def peakmem_parityplot(self, rows, targets, mode, backend):
+        spyglass.parityplot(*self.args, mode=mode)
+
+    def time_parityplot_spec(self, rows, targets, mode, backend):
+        """prediction and binning only, nothing drawn"""
+        spyglass.parityplot(*self.args, mode=mode, spec=True)
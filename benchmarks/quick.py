@@ -0,0 +1,95 @@
+"""
+run the asv benchmark classes once per parameter combination, without
+asv, for a quick reading in this environment:
+
+python benchmarks/quick.py [module-or-benchmark substring ...] [--save results.json]
+
+Each time_ benchmark is timed once and its peak traced memory
+reported, each track_ benchmark reports its value in its unit.
+--save writes the readings as JSON, compare two saved readings with
+--compare old.json new.json.
+
+For results stored per commit, and regressions across versions,
+use asv itself, results are kept in .asv/results:
+asv run HEAD~5..HEAD
+asv compare HEAD~5 HEAD
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULES = sorted(f[:-3] for f in os.listdir(HERE) if f.startswith("bench_") and f.endswith(".py"))
+
+def _combinations(cls):
+    params = getattr(cls, "params", [])
+    if params and not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+def _run(patterns):
+    """reading of every matching benchmark: {name: (seconds, peak MiB)}"""
+    sys.path.insert(0, HERE)
+    readings = {}
+    for modname in MODULES:
+        module = importlib.import_module(modname)
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != modname:
+                continue
+            benchmarks = [m for m in dir(cls) if m.startswith(("time_", "track_"))]
+            for combo, method in itertools.product(_combinations(cls), benchmarks):
+                name = f"{modname}.{cls_name}.{method}{combo}"
+                if patterns and not any(p in name for p in patterns):
+                    continue
+                bench = cls()
+                try:
+                    bench.setup(*combo)
+                except NotImplementedError:
+                    continue
+                if method.startswith("track_"):
+                    value = getattr(bench, method)(*combo)
+                    unit = getattr(getattr(cls, method), "unit", "")
+                    readings[name] = (value, None)
+                    print(f"{name:80s} {value:9.4f} {unit}", flush=True)
+                else:
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    getattr(bench, method)(*combo)
+                    elapsed = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1] / 2**20
+                    tracemalloc.stop()
+                    readings[name] = (elapsed, peak)
+                    print(f"{name:80s} {elapsed:9.4f} s {peak:9.1f} MiB", flush=True)
+                if hasattr(bench, "teardown"):
+                    bench.teardown(*combo)
+    return readings
+
+def _compare(old:str, new:str):
+    with open(old) as f:
+        old = json.load(f)
+    with open(new) as f:
+        new = json.load(f)
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name][0] / old[name][0] if old[name][0] else float("nan")
+        flag = "  slower" if ratio > 1.2 else "  faster" if ratio < 1 / 1.2 else ""
+        print(f"{name:80s} {old[name][0]:9.4f} -> {new[name][0]:9.4f} x{ratio:5.2f}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patterns", nargs="*")
+    parser.add_argument("--save")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+    if args.compare:
+        _compare(*args.compare)
+    else:
+        readings = _run(args.patterns)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(readings, f, indent=1)
@@ -10,8 +10,9 @@ to set an interactive backend
 
 use matplotlib.use(Agg) or %matplotlib inline to receive hard-copy figure files
 """
-from spyglass.utils import recolumn
-from spyglass.utils import get_cmap
+from spyglass._utils import recolumn
+from spyglass._utils import get_cmap
+from spyglass._utils import _GridIndex, _label_array
 
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
@@ -52,7 +53,7 @@ class EDAFigure(Figure):
         #the figure before any additional -- this is bad.
         self.button_clear_all.on_clicked(callback)
     
- class Interaxes(Axes):
+class Interaxes(Axes):
     """
     matplotlib.axes.Axes class containing methods defining user
     annotate on click actions on member artist objects. It also
@@ -67,11 +68,44 @@ class EDAFigure(Figure):
     # The projection must specify a name. This will be used by the
     # user to select the projection,
     # i.e. ``subplot(projection='custom_hammer')``
+    pickradius = 5 # display pixels around a click searched for markers
+    picklimit = 10 # most markers annotated per click
     def __init__(self, *args, **kwargs):                             
         super().__init__(*args, **kwargs) #takes all axes args, exposes          
                                           #artists + pyplot interface            
+        self._index = None
+        #annotations are an animated overlay blitted over a cached
+        #background of the data layer
+        self._annotations = []
+        self._background = None
         #link event handler function to the display
         self.figure.canvas.mpl_connect('pick_event', self.onclickdot)
+        self.figure.canvas.mpl_connect('button_press_event', self.onclickindex)
+        self.figure.canvas.mpl_connect('draw_event', self.ondraw)
+
+    def ondraw(self, event):
+        """
+        after a full draw, cache the data layer as the background and
+        draw the annotation overlay on top
+        """
+        if event.canvas.supports_blit and not event.canvas.is_saving():
+            self._background = event.canvas.copy_from_bbox(self.figure.bbox)
+        for annotation in self._annotations:
+            annotation.draw(event.renderer)
+
+    def blitannotations(self):
+        """
+        show the current annotations by restoring the cached background
+        and drawing only the overlay over it
+        """
+        canvas = self.figure.canvas
+        if self._background is None or not canvas.supports_blit:
+            canvas.draw_idle() #nothing cached yet
+            return
+        canvas.restore_region(self._background)
+        for annotation in self._annotations:
+            self.draw_artist(annotation)
+        canvas.blit(self.figure.bbox)
 
     def make_onclickclear(self):
         """
@@ -79,8 +113,10 @@ class EDAFigure(Figure):
         widget behavior relative to this axes
         """
         def onclickclear(event):
-            self.cla() #clear artist objects from axes
-            self.drawself() #draw the chosen boilerplate axes
+            for annotation in self._annotations:
+                annotation.remove()
+            self._annotations.clear()
+            self.blitannotations() #data layer is restored, never re-plotted
         return onclickclear
             
     def makeannotate(self, label, labelx, labely):
@@ -96,11 +132,13 @@ class EDAFigure(Figure):
         #                                   y_transform=self.transData)
         text_annotation = Annotation(label, xy=(labelx, labely),  #what, at what
                                      xytext=(labelx, labely), #where
-                                     xycoords=trans, #x-position adaptive
+                                     xycoords='data', #x-position adaptive
                                      textcoords="offset points",
                                      bbox=bboxspec, #what style
-                                     arrowprops=arrowspec) #at what style
+                                     arrowprops=arrowspec, #at what style
+                                     animated=True) #drawn on the overlay
         self.add_artist(text_annotation)
+        self._annotations.append(text_annotation)
         #alternative for less deps?
         #axis.annotate(label, xy=(x,y), xytext=xy,
         #             xycooords='data', #textcoords="offset points", #at what ref, where ref
@@ -118,10 +156,9 @@ class EDAFigure(Figure):
         offset = 0
         #if dots overlap, matplotlib returns returns a list of clicked indices.
         #parse the list:
-        if isinstance(self.labels, pd.DataFrame):
-            labels = self.labels.values.tolist()
-        else:
-            labels = self.labels
+        if getattr(self, '_labelarray', None) is None:
+            self._labelarray = _label_array(self.labels)
+        labels = self._labelarray
             
         for i in ind:
             #Assign a label to its corresponding data point
@@ -130,8 +167,40 @@ class EDAFigure(Figure):
             self.makeannotate(label,
                               annotx + offset,
                               annoty + offset)
-            self.figure.canvas.draw_idle() #force re-draw
             offset += 0.05 # in case of list, alter offset 
+        self.blitannotations() #redraw the overlay once
+
+    def indexpoints(self, x, y, datalabels):
+        """
+        prepare click annotation of the markers at x, y: labels are
+        converted once and a grid index over the coordinates is built,
+        so a click only inspects the markers near it.
+        """
+        self.labels = datalabels
+        self._labelarray = _label_array(datalabels)
+        self._index = _GridIndex(x, y)
+
+    def onclickindex(self, event):
+        """
+        define the click on indexed marker behavior: annotate the
+        markers within pickradius pixels of the click, nearest first,
+        with a single redraw
+        """
+        if event.inaxes is not self or self._index is None:
+            return
+        if getattr(self.figure.canvas.toolbar, 'mode', ''):
+            return #zooming or panning
+        inv = self.transData.inverted()
+        (x, y), (x1, y1) = inv.transform([(event.x, event.y),
+                                          (event.x + self.pickradius,
+                                           event.y + self.pickradius)])
+        ind = self._index.query(x, y, abs(x1 - x), abs(y1 - y))[:self.picklimit]
+        offset = 0
+        for i in ind:
+            self.makeannotate(self._labelarray[i], x + offset, y + offset)
+            offset += 0.05 # in case of list, alter offset
+        if len(ind):
+            self.blitannotations() #redraw the overlay once
 
     def activescatter(self, x, y, datalabels, *args, **kwargs):
         """
@@ -141,10 +210,10 @@ class EDAFigure(Figure):
         #place arguments in instance namespace
         self.x=x
         self.y=y
-        self.labels=datalabels
+        self.indexpoints(x, y, datalabels)
         #plot data
         def draw_activescatter(): #draw functions may be called out of their defining function scope on_click_clear
-            self.scatter(self.x, self.y, *args, picker=True, **kwargs)
+            self.scatter(self.x, self.y, *args, **kwargs)
             self.set_xlabel("X")
             self.set_ylabel("Y")
             self.grid()
@@ -207,6 +276,8 @@ class EDAFigure(Figure):
         self.scalexy = scalePCdata.iloc[:, [components[0], components[1]]]
         # use for determining cluster color or unique color behavior
         self.uniqL = self.labels.drop_duplicates()
+        # annotate clicks on the projected points
+        self.indexpoints(self.scalexy.iloc[:, 0], self.scalexy.iloc[:, 1], self.labels)
         # compute projections of original dimensions on plane
         slice1 = transform_matrix[components[0]]
         slice2 = transform_matrix[components[1]]
@@ -221,7 +292,7 @@ class EDAFigure(Figure):
                 groups = clusterxy.groupby(self.labels.columns.values[0])
                 for name, group in groups:
                     self.scatter(group.iloc[:, 0], group.iloc[:, 1],
-                                 label = name, picker=True, **kwargs)
+                                 label = name, **kwargs)
                 self.legend()
                 #cbar = self.figure.colorbar(self, **cbar_kw)
                 #cbar.ax.set_ylabel(cbarlabel, rotation=-90, va="bottom")
@@ -230,10 +301,10 @@ class EDAFigure(Figure):
                 #if labels consists of unique strings label without color
                 if isinstance(self.labels.dtype, object): #dtype for series (index) dtypes or dataframe
                     self.scatter(self.scalexy.iloc[:, 0], self.scalexy.iloc[:, 1],
-                                 picker=True, **kwargs)
+                                 **kwargs)
                 else: #if numbers, make and apply colorscale as well as label
                     self.scatter(self.scalexy.iloc[:, 0], self.scalexy.iloc[:, 1],
-                                 c=self.labels, picker=True, **kwargs)
+                                 c=self.labels, **kwargs)
                     cbar = self.figure.colorbar(self, **cbar_kw)
                     cbar.ax.set_ylabel(cbarlabel, rotation=-90, va="bottom")
             else:
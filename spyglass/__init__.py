@@ -1,6 +1,12 @@
 __version__ = '0.1.2'
 
-from .sk_imaging import parityplot, biplot
+from .sk_imaging import parityplot, biplot, Biplot, LiveParity
+from ._fig_library import set_backend, get_backend, use_pyplot
+from ._cache import PredictionCache, prediction_cache, FigureCache, figure_cache
+from ._spec import FigureSpec
+from ._profile import profile, add_hook, remove_hook
+from .batch import render
+from ._corr import correlation, corrmap
 
 #generic plotting tools
 #from .spyglass import whatever
@@ -8,6 +14,22 @@ from .sk_imaging import parityplot, biplot
 __all__ = [
     'parityplot',
     'biplot',
+    'Biplot',
+    'LiveParity',
+    'set_backend',
+    'get_backend',
+    'use_pyplot',
+    'PredictionCache',
+    'prediction_cache',
+    'FigureSpec',
+    'FigureCache',
+    'figure_cache',
+    'profile',
+    'add_hook',
+    'remove_hook',
+    'render',
+    'correlation',
+    'corrmap',
 ]
 #consider moving all of this to a dedicated Backend subpackage? see hvplot package?
 # from spyglass.spyglass.plotmodule import (
@@ -0,0 +1,245 @@
+""" memoization of estimator outputs for repeated plotting calls"""
+import pandas as pd
+import numpy as np
+
+import os
+import glob
+import hashlib
+import pickle
+from collections import OrderedDict
+from threading import Lock
+
+from ._frames import _kind, _columns
+
+class _HashWriter():
+    """file-like sink feeding pickle output straight into a hash"""
+    def __init__(self, h):
+        self.h = h
+
+    def write(self, b):
+        self.h.update(b)
+
+def _fingerprint(estimator) -> str:
+    """hash of the full pickled state of a fitted estimator"""
+    h = hashlib.blake2b(digest_size=16)
+    pickle.dump(estimator, _HashWriter(h), protocol=pickle.HIGHEST_PROTOCOL)
+    return h.hexdigest()
+
+def _hash_data(X) -> str:
+    """fast content hash of an array or frame, without pickling it"""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(X, (pd.DataFrame, pd.Series)):
+        names = list(X.columns) if isinstance(X, pd.DataFrame) else X.name
+        h.update(pickle.dumps(names))
+        X = pd.util.hash_pandas_object(X, index=True).to_numpy()
+    elif _kind(X) == 'polars':
+        h.update(pickle.dumps(_columns(X)))
+        X = X.hash_rows().to_numpy() if hasattr(X, 'hash_rows') else X.hash().to_numpy()
+    elif _kind(X) == 'arrow': #the buffers themselves, no copy
+        h.update(pickle.dumps((X.schema.to_string(), X.num_rows)))
+        for column in X.columns:
+            for chunk in column.chunks:
+                h.update(repr((chunk.offset, len(chunk))).encode())
+                for buffer in chunk.buffers():
+                    if buffer is not None:
+                        h.update(buffer)
+        return h.hexdigest()
+    if isinstance(X, np.ndarray) and X.dtype != object:
+        h.update(repr((X.shape, X.dtype.str)).encode())
+        h.update(np.ascontiguousarray(X).view(np.uint8).reshape(-1))
+    else:
+        pickle.dump(X, _HashWriter(h), protocol=pickle.HIGHEST_PROTOCOL)
+    return h.hexdigest()
+
+def _shrink(directory:str, pattern:str, max_bytes:int):
+    """delete least recently used files matching pattern beyond max_bytes"""
+    files = [(os.stat(f), f) for f in glob.glob(os.path.join(directory, pattern))]
+    files.sort(key=lambda sf: sf[0].st_mtime)
+    total = sum(stat.st_size for stat, _ in files)
+    for stat, f in files:
+        if total <= max_bytes:
+            break
+        os.remove(f)
+        total -= stat.st_size
+
+class PredictionCache():
+    """
+    Memoize estimator outputs, keyed on fingerprints of the fitted
+    estimator, the input data and the call keywords.
+
+    The most recent maxsize results are kept in memory. If a
+    directory is given, results are also saved there as .npy files
+    and the least recently used files are deleted once they exceed
+    max_bytes in total.
+
+    Refitting an estimator changes its fingerprint, so stale entries
+    are never returned, they just age out. Use invalidate() to drop
+    entries explicitly.
+
+    Cached arrays are returned read-only.
+    """
+    def __init__(self, maxsize:int=32, directory:str=None, max_bytes:int=2**30):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._memory)
+
+    def keys(self, estimator, Xs, method:str="predict", kwargs:dict={}) -> list:
+        """cache keys of calling estimator.method(X, **kwargs) on each X"""
+        return self._keys([estimator], Xs, method, kwargs)
+
+    def _keys(self, estimators, Xs, method:str, kwargs:dict) -> list:
+        """keys of every estimator on every X, estimator-major, each X hashed once"""
+        call = hashlib.blake2b(pickle.dumps((method, sorted(kwargs.items()))),
+                               digest_size=8).hexdigest()
+        data = [_hash_data(X) for X in Xs]
+        return [f"{_fingerprint(estimator)}-{h}-{call}"
+                for estimator in estimators for h in data]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key:str):
+        """the cached result for key or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            os.utime(self._path(key)) #mark as recently used
+            return self._remember(key, np.load(self._path(key)))
+        return None
+
+    def put(self, key:str, value):
+        """cache value under key and return the cached array"""
+        value = self._remember(key, np.asarray(value))
+        if self.directory is not None and value.dtype != object:
+            tmp = self._path(key) + f".{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp, self._path(key))
+            self._shrink()
+        return value
+
+    def _remember(self, key, value):
+        value = value.view() #read-only view, leave the original writable
+        value.setflags(write=False)
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+        return value
+
+    def _shrink(self):
+        _shrink(self.directory, "*.npy", self.max_bytes)
+
+    def invalidate(self, estimator=None):
+        """drop the entries of estimator, or every entry if None"""
+        prefix = "" if estimator is None else _fingerprint(estimator) + "-"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+        if self.directory is not None:
+            for f in glob.glob(os.path.join(self.directory, prefix + "*.npy")):
+                os.remove(f)
+
+    def clear(self):
+        """drop every entry"""
+        self.invalidate()
+
+#shared cache used when plotting functions are passed cache=True
+prediction_cache = PredictionCache()
+
+def _cached_map(cache, pmap, func, estimator, Xs, method:str, kwargs:dict):
+    """
+    map func over Xs with pmap, only calling it for the inputs the
+    cache holds no result for.
+
+    cache may be None or False (no caching), True (the shared cache)
+    or a PredictionCache
+    """
+    if cache is None or cache is False:
+        return list(pmap(func, Xs))
+    if cache is True:
+        cache = prediction_cache
+    return _lookup(cache, pmap, func, Xs, cache.keys(estimator, Xs, method, kwargs))
+
+def _cached_product(cache, pmap, func, estimators, Xs, method:str, kwargs:dict):
+    """
+    as _cached_map, mapping func over every (estimator, X) pair in one
+    pool, estimator-major, so all estimators are scheduled together
+    """
+    pairs = [(estimator, X) for estimator in estimators for X in Xs]
+    if cache is None or cache is False:
+        return list(pmap(func, pairs))
+    if cache is True:
+        cache = prediction_cache
+    return _lookup(cache, pmap, func, pairs, cache._keys(estimators, Xs, method, kwargs))
+
+def _lookup(cache, pmap, func, items, keys):
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in zip(missing, pmap(func, [items[i] for i in missing])):
+        results[i] = cache.put(keys[i], result)
+    return results
+
+def _cache_home() -> str:
+    return os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                       os.path.join(os.path.expanduser("~"), ".cache")),
+                        "spyglass", "figures")
+
+#files named backend-spechash.format, leaves other files in directory alone
+_FIGURE_GLOB = "*-" + "[0-9a-f]" * 32 + ".*"
+
+class FigureCache():
+    """
+    Rendered figures (png, svg, html, ...) saved in directory, keyed
+    by the hash of their FigureSpec, backend and format.
+
+    The least recently used files are deleted once they exceed
+    max_bytes in total. directory defaults to spyglass/figures in the
+    user cache directory ($XDG_CACHE_HOME or ~/.cache) and is only
+    created when the first figure is saved.
+    """
+    def __init__(self, directory:str=None, max_bytes:int=2**28):
+        self.directory = _cache_home() if directory is None else directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key:str, format:str):
+        return os.path.join(self.directory, f"{key}.{format}")
+
+    def get(self, key:str, format:str):
+        """the cached bytes of key in format or None"""
+        try:
+            with open(self._path(key, format), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(self._path(key, format)) #mark as recently used
+        return content
+
+    def put(self, key:str, format:str, content:bytes):
+        """cache content under key and format"""
+        os.makedirs(self.directory, exist_ok=True)
+        #hidden until complete, glob skips dotfiles
+        tmp = os.path.join(self.directory, f".{key}.{format}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, self._path(key, format))
+        _shrink(self.directory, _FIGURE_GLOB, self.max_bytes)
+        return content
+
+    def clear(self):
+        """drop every entry"""
+        for f in glob.glob(os.path.join(self.directory, _FIGURE_GLOB)):
+            os.remove(f)
+
+#shared cache used when figures are exported with cache=True
+figure_cache = FigureCache()
@@ -0,0 +1,311 @@
+"""
+feature correlation maps of wide descriptor tables, computed in
+blocks of rows and features so memory does not grow with the rows
+"""
+import pandas as pd
+import numpy as np
+
+import os
+import tempfile
+import warnings
+from itertools import chain
+
+from ._stream import _iter_chunks, _transform_stream
+from ._frames import _kind, _columns, _column_arrays
+from ._profile import _call, _stage
+
+#bytes of float64 accumulators per pass over the data
+BLOCKBYTES = 2**28
+#bytes of a standardized float32 row block
+ROWBYTES = 2**26
+
+def _numeric(chunk) -> list:
+    """positions of the numeric columns of a block"""
+    if isinstance(chunk, pd.DataFrame):
+        return [j for j, dtype in enumerate(chunk.dtypes) if dtype.kind in 'fiub']
+    return [j for j, a in enumerate(_column_arrays(chunk)) if a.dtype.kind in 'fiub']
+
+def _matrix(chunk, keep:list) -> np.ndarray:
+    """the kept columns of a block as one float32 (rows, features) array"""
+    if isinstance(chunk, pd.DataFrame): #one conversion per dtype block
+        return chunk.iloc[:, keep].to_numpy(dtype=np.float32, na_value=np.nan)
+    arrays = _column_arrays(chunk)
+    return np.column_stack([np.asarray(arrays[j], dtype=np.float32) for j in keep])
+
+def _reiterable(data) -> bool:
+    """whether _iter_chunks can read data again from the start"""
+    if isinstance(data, (str, os.PathLike, np.ndarray, pd.DataFrame)):
+        return True
+    name = type(data).__name__
+    return ((_kind(data) == 'polars' and name == 'DataFrame')
+            or (_kind(data) == 'arrow' and name == 'Table'))
+
+def _source(data, chunksize:int=None, spill:str=None):
+    """
+    feature names and a function iterating float32 row blocks of the
+    numeric columns. Anything but paths, arrays and in-memory frames
+    and tables, e.g. iterators or chunked readers, is read once and
+    written to a memory map at spill, so it can be read in several
+    passes.
+    """
+    width = len(_columns(data)) if hasattr(data, 'shape') else None
+    if isinstance(data, (str, os.PathLike)):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("reading Parquet files requires pyarrow") from e
+        width = pq.ParquetFile(data).metadata.num_columns
+    rows = None if width is None else max(1, ROWBYTES // (4 * width))
+    chunks = _iter_chunks(data, chunksize or rows)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError("no data to correlate")
+    keep, columns = _numeric(first), _columns(first)
+    names = [columns[j] for j in keep]
+    if len(names) < 2:
+        raise ValueError("at least two numeric features are needed")
+    rows = max(1, ROWBYTES // (4 * len(names)))
+    if not _reiterable(data):
+        stored, _, _ = _transform_stream(lambda c: _matrix(c, keep), chain([first], chunks),
+                                         out=spill)
+        def blocks():
+            for start in range(0, len(stored), rows):
+                yield np.asarray(stored[start:start+rows])
+        return names, blocks
+    def blocks():
+        for chunk in _iter_chunks(data, chunksize or rows):
+            x = _matrix(chunk, keep)
+            for start in range(0, len(x), rows):
+                yield x[start:start+rows]
+    return names, blocks
+
+def _moments(blocks) -> tuple:
+    """count, mean and population standard deviation of each feature, ignoring NaN"""
+    n, total, squares, shift = 0, 0., 0., None
+    for x in blocks():
+        if shift is None: #shifted sums keep float64 sums of large values exact
+            with warnings.catch_warnings(): #all NaN columns
+                warnings.simplefilter("ignore", RuntimeWarning)
+                shift = np.nan_to_num(np.nanmean(x, axis=0, dtype=np.float64)).astype(np.float32)
+        d = x - shift
+        valid = ~np.isnan(d)
+        d = np.where(valid, d, 0)
+        n = n + valid.sum(axis=0)
+        total = total + d.sum(axis=0, dtype=np.float64)
+        squares = squares + (d * d).sum(axis=0, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+        std = np.sqrt(np.maximum(squares / n - mean**2, 0))
+    return n, shift + mean, std
+
+def _standardize(x:np.ndarray, mean, scale) -> np.ndarray:
+    """z scores in float32, missing values at the mean"""
+    z = (x - mean.astype(np.float32)) * scale
+    return np.nan_to_num(z, copy=False, nan=0., posinf=0., neginf=0.)
+
+def _correlate(blocks, p:int, threshold:float=None, blocksize:int=None):
+    """
+    Pearson correlations of p features, blocksize rows of the matrix
+    per pass over the data. Each row block is standardized and
+    multiplied in float32, products are added up in float64.
+
+    returns the dense float32 matrix, or with a threshold the (i, j, r)
+    arrays of the pairs i < j with |r| >= threshold
+    """
+    with _stage("moments") as stage:
+        n, mean, std = _moments(blocks)
+        stage.rows = int(n.max())
+    with np.errstate(divide="ignore"):
+        scale = np.where(std > 0, 1 / std, 0).astype(np.float32)
+        norm = 1 / np.sqrt(np.maximum(n, 1))
+    blocksize = blocksize or max(1, BLOCKBYTES // (8 * p))
+    dense = np.empty((p, p), dtype=np.float32) if threshold is None else None
+    pairs = []
+    for i0 in range(0, p, blocksize):
+        i1 = min(i0 + blocksize, p)
+        with _stage("correlate", rows=i1 - i0):
+            #in threshold mode only pairs right of the diagonal are needed
+            j0 = 0 if threshold is None else i0
+            acc = np.zeros((i1 - i0, p - j0))
+            for x in blocks():
+                z = _standardize(x[:, j0:], mean[j0:], scale[j0:])
+                acc += z[:, i0-j0:i1-j0].T @ z
+            r = (acc * norm[i0:i1, None] * norm[None, j0:]).astype(np.float32)
+            r[:, std[j0:] == 0] = np.nan
+            r[std[i0:i1] == 0] = np.nan
+            np.clip(r, -1, 1, out=r)
+        if threshold is None:
+            dense[i0:i1] = r
+            continue
+        i, j = np.nonzero(np.abs(r) >= threshold)
+        above = j + j0 > i + i0
+        pairs.append((i[above] + i0, j[above] + j0, r[i[above], j[above]]))
+    if threshold is None:
+        np.fill_diagonal(dense, np.where(std > 0, 1, np.nan))
+        return dense
+    i, j, r = (np.concatenate(a) for a in zip(*pairs))
+    return i, j, r
+
+def _single_linkage_order(p:int, i:np.ndarray, j:np.ndarray, r:np.ndarray) -> np.ndarray:
+    """
+    leaf order of single linkage clustering of p features at distance
+    1 - |r| over the given pairs, absent pairs are joined last.
+
+    Clusters are merged along the pairs in order of decreasing |r|,
+    each one kept as a linked list of its leaves, so the order comes
+    from the pairs alone. The pairs are first cut down to a minimum
+    spanning tree when scipy is available.
+    """
+    strength = np.nan_to_num(np.abs(r))
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import minimum_spanning_tree
+    except ImportError:
+        pass
+    else: #zero weights are no edges, so distances are offset
+        tree = minimum_spanning_tree(coo_matrix((2 - strength, (i, j)), shape=(p, p))).tocoo()
+        i, j, strength = tree.row, tree.col, 2 - tree.data
+    order = np.argsort(-strength, kind="stable")
+    parent, nxt = list(range(p)), [-1] * p
+    head, tail = list(range(p)), list(range(p))
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+    merges = 0
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        a, b = find(a), find(b)
+        if a == b:
+            continue
+        nxt[tail[a]] = head[b]
+        tail[a] = tail[b]
+        parent[b] = a
+        merges += 1
+        if merges == p - 1:
+            break
+    leaves = []
+    for root in range(p):
+        if find(root) == root:
+            leaf = head[root]
+            while leaf != -1:
+                leaves.append(leaf)
+                leaf = nxt[leaf]
+    return np.array(leaves)
+
+def correlation(data, threshold:float=None, cluster:bool=True,
+                chunksize:int=None, blocksize:int=None):
+    """
+    Pearson correlations between the numeric columns of data,
+    computed blockwise in float32 without holding the rows in memory
+
+    data may be anything spyglass streams: a pandas, Polars or Arrow
+    frame, a NumPy array or memmap, a Parquet file path or an
+    iterable of such blocks (e.g. pd.read_csv(path, chunksize=n) or
+    an Arrow RecordBatchReader), read chunksize rows at a time. Missing
+    values count as the feature's mean, constant features correlate
+    as NaN.
+
+    blocksize features are correlated against all others per pass
+    over the data, by default as many as BLOCKBYTES of accumulators
+    hold, so very wide tables are read several times (iterables are
+    written once to a temporary file for that, removed on return).
+
+    threshold keeps only the pairs with |r| >= threshold, and returns
+    them as a long frame of feature_a, feature_b and r, one row per
+    pair, in place of the dense features x features frame. Only those
+    pairs are ever stored.
+
+    cluster reorders the features by single linkage hierarchical
+    clustering on 1 - |r|, so correlated features are adjacent. The
+    dense frame is indexed in that order, the feature columns of the
+    long frame are categoricals ordered that way.
+    """
+    with _call("correlation"), tempfile.TemporaryDirectory(prefix="spyglass-") as spill:
+        names, blocks = _source(data, chunksize, os.path.join(spill, "rows.dat"))
+        p = len(names)
+        result = _correlate(blocks, p, threshold, blocksize)
+        del blocks #unmaps the spilled rows before they are removed
+        with _stage("cluster", rows=p):
+            if threshold is None:
+                pairs = np.triu_indices(p, 1)
+                order = (_single_linkage_order(p, *pairs, result[pairs]) if cluster
+                         else np.arange(p))
+            else:
+                order = _single_linkage_order(p, *result) if cluster else np.arange(p)
+        labels = pd.Index(names)[order]
+        if threshold is None:
+            return pd.DataFrame(result[np.ix_(order, order)], index=labels, columns=labels)
+        i, j, r = result
+        rank = np.empty(p, dtype=np.intp)
+        rank[order] = np.arange(p)
+        a, b = np.minimum(rank[i], rank[j]), np.maximum(rank[i], rank[j])
+        first = np.lexsort((b, a))
+        return pd.DataFrame({
+            "feature_a": pd.Categorical.from_codes(a[first], categories=labels),
+            "feature_b": pd.Categorical.from_codes(b[first], categories=labels),
+            "r": r[first],
+        })
+
+def _pair_grid(pairs:pd.DataFrame, cells:int) -> tuple:
+    """
+    the thresholded pairs as a symmetric matrix of at most cells per
+    side, the mean r of each block of features, pairs below the
+    threshold counting as 0. Returns the matrix and block labels.
+    """
+    labels = pairs.feature_a.cat.categories
+    p = len(labels)
+    f = -(-p // cells)
+    k = -(-p // f)
+    a = pairs.feature_a.cat.codes.to_numpy().astype(np.intp) // f
+    b = pairs.feature_b.cat.codes.to_numpy().astype(np.intp) // f
+    r = np.nan_to_num(pairs.r.to_numpy(dtype=np.float64))
+    total = np.bincount(a * k + b, weights=r, minlength=k*k) \
+        + np.bincount(b * k + a, weights=r, minlength=k*k)
+    total += np.bincount(np.arange(p) // f * (k + 1), minlength=k*k) #the diagonal
+    sizes = np.bincount(np.arange(p) // f, minlength=k)
+    grid = total.reshape(k, k) / np.outer(sizes, sizes)
+    return grid.astype(np.float32), [str(label) for label in labels[::f]]
+
+def corrmap(data, threshold:float=None, cluster:bool=True,
+            chunksize:int=None, blocksize:int=None,
+            ax=None, max_cells:int=None, **kwargs):
+    """
+    Draw the spyglass.correlation of the numeric columns of data with
+    spyglass.spyglass.heatmap, see correlation for the arguments
+
+    max_cells defaults to the pixel size of the axes, so no more cells
+    are drawn than the screen shows. A dense map is resampled as the
+    view is zoomed. With a threshold the kept pairs are summed into a
+    grid of at most max_cells per side directly, never densified, and
+    each cell is labelled by its first feature.
+
+    **kwargs are passed to heatmap, e.g. cbar_kw, or on to imshow.
+
+    returns the image, its colorbar and the correlations
+    """
+    from .spyglass import heatmap
+    from ._utils import _figure
+    from ._fig_library import _uses_pyplot
+    with _call("corrmap"):
+        r = correlation(data, threshold, cluster, chunksize, blocksize)
+        with _stage("figure"):
+            if ax is None and _uses_pyplot():
+                import matplotlib.pyplot as plt
+                ax = plt.gca()
+            elif ax is None: #standalone, pyplot never tracks it
+                ax = _figure().subplots()
+            cells = max_cells or max(1, int(max(ax.bbox.width, ax.bbox.height)))
+            kwargs.setdefault("cmap", "RdBu_r")
+            kwargs.setdefault("vmin", -1)
+            kwargs.setdefault("vmax", 1)
+            kwargs.setdefault("cbarlabel", "r")
+            if threshold is None:
+                labels = [str(label) for label in r.index]
+                im, cbar = heatmap(r.to_numpy(), labels, labels, ax=ax,
+                                   max_cells=cells, **kwargs)
+            else:
+                grid, labels = _pair_grid(r, cells)
+                im, cbar = heatmap(grid, labels, labels, ax=ax,
+                                   max_cells=len(labels), **kwargs)
+    return im, cbar, r
@@ -1,13 +1,120 @@
-import pkg_resources
-
-installed = [pkg.key for pkg in pkg_resources.working_set]
-
-if 'plotly' in installed:
-    from ._plotly_fig_library import _make_parity_fig
-    from ._plotly_fig_library import _make_biplot
-else: #or import error
-    from ._sns_fig_library import _make_parity_fig
-    from ._sns_fig_library import _make_biplot
-    
-__all__ = ['_make_parity_fig',
-           '_make_biplot']
+"""
+figure library backends
+
+The plotting library is not imported until the first figure is
+made. Which library is used is decided, in order of precedence, by:
+1. spyglass.set_backend("plotly"|"seaborn")
+2. the SPYGLASS_BACKEND environment variable
+3. plotly if it can be found, seaborn otherwise
+
+Matplotlib figures, of the seaborn backend and spyglass.spyglass.heatmap,
+are made through pyplot unless spyglass.use_pyplot(False) or the
+SPYGLASS_PYPLOT=0 environment variable say otherwise.
+"""
+import os
+from importlib import import_module
+from importlib.util import find_spec
+
+_BACKENDS = {
+    'plotly': '._plotly_fig_library',
+    'seaborn': '._sns_fig_library',
+}
+
+_backend_name = None
+_backend = None
+_pyplot = None
+
+def set_backend(name:str):
+    """
+    choose the plotting library used by parityplot and biplot.
+
+    The library is only imported when the next figure is made.
+    """
+    global _backend_name, _backend
+    if name not in _BACKENDS:
+        raise ValueError(f"unknown backend '{name}', choose from {list(_BACKENDS)}")
+    _backend_name = name
+    _backend = None
+
+def get_backend() -> str:
+    """return the name of the plotting library in use"""
+    global _backend_name
+    if _backend_name is None:
+        name = os.environ.get('SPYGLASS_BACKEND')
+        if name is not None:
+            set_backend(name)
+        elif find_spec('plotly') is not None:
+            _backend_name = 'plotly'
+        else: #or import error
+            _backend_name = 'seaborn'
+    return _backend_name
+
+def use_pyplot(enabled:bool=True):
+    """
+    make matplotlib figures through pyplot (the default), so they show
+    in notebooks and GUI windows, or as standalone Figures with their
+    own Agg canvas, which pyplot never tracks.
+
+    Standalone figures share no state, so they can be drawn from many
+    threads at once, e.g. in a web service. They are only displayed
+    by saving or exporting them, hover labels need pyplot.
+    """
+    global _pyplot
+    _pyplot = bool(enabled)
+
+def _uses_pyplot() -> bool:
+    global _pyplot
+    if _pyplot is None:
+        _pyplot = os.environ.get('SPYGLASS_PYPLOT', '1') not in ('0', 'false', 'no')
+    return _pyplot
+
+def _load(name:str=None):
+    """import the backend module on first use, or the named backend"""
+    global _backend
+    if name is not None:
+        if name not in _BACKENDS:
+            raise ValueError(f"unknown backend '{name}', choose from {list(_BACKENDS)}")
+        return import_module(_BACKENDS[name], __name__)
+    if _backend is None:
+        _backend = import_module(_BACKENDS[get_backend()], __name__)
+    return _backend
+
+def _make_parity_fig(*args, **kwargs):
+    return _load()._make_parity_fig(*args, **kwargs)
+
+def _make_parity_density(*args, **kwargs):
+    return _load()._make_parity_density(*args, **kwargs)
+
+def _make_parity_live(*args, **kwargs):
+    return _load()._make_parity_live(*args, **kwargs)
+
+def _update_parity(*args, **kwargs):
+    return _load()._update_parity(*args, **kwargs)
+
+def _make_biplot(*args, **kwargs):
+    return _load()._make_biplot(*args, **kwargs)
+
+def _make_biplot_density(*args, **kwargs):
+    return _load()._make_biplot_density(*args, **kwargs)
+
+def _update_biplot(*args, **kwargs):
+    return _load()._update_biplot(*args, **kwargs)
+
+def _make_scatter_matrix(*args, **kwargs):
+    return _load()._make_scatter_matrix(*args, **kwargs)
+
+def _export(*args, **kwargs):
+    return _load()._export(*args, **kwargs)
+
+__all__ = ['set_backend',
+           'get_backend',
+           'use_pyplot',
+           '_make_parity_fig',
+           '_make_parity_density',
+           '_make_parity_live',
+           '_update_parity',
+           '_make_biplot',
+           '_make_biplot_density',
+           '_update_biplot',
+           '_make_scatter_matrix',
+           '_export']
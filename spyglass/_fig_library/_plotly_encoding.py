@@ -0,0 +1,200 @@
+"""
+compact HTML and JSON for plotly figures with many points
+
+Trace arrays are written as base64 typed arrays instead of JSON
+number text, optionally downcast to float32 or quantized to 8 or 16
+bit codes over each array's range. In HTML a short loader decodes
+them into typed arrays before plotting, so any plotly.js reads them.
+JSON uses plotly's typed array spec, read by plotly.js 2.28 and later.
+"""
+import numpy as np
+
+import base64
+import hashlib
+import json
+import re
+
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+_PRECISIONS = (None, "float32", 16, 8)
+
+#kept apart from the data, so it is compiled as a small script of its own
+_LOADER = """function spyglassPlot(div, encoded, specs, figure){
+var types = {f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array,
+             i1: Int8Array, u4: Uint32Array, u2: Uint16Array, u1: Uint8Array};
+var buffers = encoded.map(function(s){
+  var bin = atob(s), bytes = new Uint8Array(bin.length);
+  for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+  return bytes.buffer;
+});
+function view(i){ //buffer, offset, length, dtype[, low, step]
+  var s = specs[i], a = new types[s[3]](buffers[s[0]], s[1], s[2]);
+  if (s.length == 4) return a;
+  var out = new Float32Array(a.length), missing = Math.pow(2, 8*a.BYTES_PER_ELEMENT) - 1;
+  for (var j = 0; j < a.length; j++) out[j] = a[j] == missing ? NaN : s[4] + a[j]*s[5];
+  return out;
+}
+function fill(o){
+  for (var k in o){
+    var v = o[k];
+    if (v && typeof v == "object"){
+      if ("$spyglass" in v) o[k] = view(v["$spyglass"]); else fill(v);
+    }
+  }
+}
+fill(figure.data);
+return Plotly.newPlot(div, figure.data, figure.layout, {responsive: true});
+}"""
+
+_PAGE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8" />
+<style>html, body {height: 100%%;}</style>
+%(plotlyjs)s
+<script type="text/javascript">
+%(loader)s
+</script>
+</head>
+<body>
+<div id="%(div)s" style="height:100%%; width:100%%;"></div>
+<script type="text/javascript">
+spyglassPlot("%(div)s", %(buffers)s, %(specs)s, %(figure)s);
+</script>
+</body>
+</html>"""
+
+def _typed(a:np.ndarray, precision):
+    """
+    a as (bytes, dtype code, quantization), quantization is None or
+    the (low, step) decoding codes to values, NaN coded as the top code
+    """
+    if a.dtype.kind in 'iu' and a.dtype.itemsize == 8: #no 64 bit arrays in javascript
+        small = np.int32 if a.dtype.kind == 'i' else np.uint32
+        a = a.astype(small) if np.array_equal(a.astype(small), a) else a.astype(float)
+    if a.dtype.kind == 'b':
+        a = a.astype(np.uint8)
+    if a.dtype.kind == 'f' and precision == "float32":
+        a = a.astype(np.float32)
+    elif a.dtype.kind == 'f' and precision in (8, 16):
+        finite = np.isfinite(a)
+        low, high = (a[finite].min(), a[finite].max()) if finite.any() else (0., 0.)
+        top = 2**precision - 1
+        step = (high - low) / (top - 1) or 1.
+        codes = np.full(a.shape, top, dtype=np.uint8 if precision == 8 else np.uint16)
+        codes[finite] = np.rint((a[finite] - low) / step)
+        return codes.tobytes(), codes.dtype.str[1:], (float(low), float(step))
+    elif a.dtype.kind == 'f':
+        a = a.astype(np.float64)
+    return np.ascontiguousarray(a).tobytes(), a.dtype.str[1:], None
+
+def _as_array(v):
+    """
+    v as an array if it is one, or a typed array spec, which newer
+    plotly versions already make of arrays
+    """
+    if isinstance(v, dict) and "bdata" in v and "dtype" in v:
+        a = np.frombuffer(base64.b64decode(v["bdata"]), dtype=np.dtype(v["dtype"]))
+        if "shape" in v:
+            a = a.reshape([int(n) for n in str(v["shape"]).split(",")])
+        return a
+    return v
+
+def _arrays(obj, found:list):
+    """replace 1D numeric arrays in obj by placeholders, collecting them"""
+    items = obj.items() if isinstance(obj, dict) else enumerate(obj)
+    for k, v in list(items):
+        v = _as_array(v)
+        if isinstance(v, np.ndarray) and v.ndim == 1 and v.dtype.kind in 'fiub' and len(v):
+            obj[k] = {"$spyglass": len(found)}
+            found.append(v)
+        elif isinstance(v, (dict, list)):
+            _arrays(v, found)
+
+def _figure_dict(p, webgl_threshold:int=None) -> dict:
+    """the figure as a dict holding numpy arrays, traces switched to WebGL above webgl_threshold"""
+    figure = p.to_plotly_json()
+    figure = {"data": [dict(trace) for trace in figure.get("data", [])],
+              "layout": figure.get("layout", {})}
+    if webgl_threshold is not None:
+        for trace in figure["data"]:
+            x = _as_array(trace.get("x"))
+            n = 0 if x is None else len(x)
+            if trace.get("type") == "scatter" and n > webgl_threshold:
+                trace["type"] = "scattergl"
+            elif trace.get("type") == "scattergl" and n <= webgl_threshold:
+                trace["type"] = "scatter"
+    for trace in figure["data"]: #to_plotly_json may hold lists and tuples
+        for k in ("x", "y", "z", "customdata"):
+            if isinstance(trace.get(k), (list, tuple)):
+                values = np.asarray(trace[k])
+                if values.dtype.kind in 'fiub':
+                    trace[k] = values
+    return figure
+
+def _script_json(obj) -> str:
+    return re.sub(r"</", r"<\\/", to_json_plotly(obj))
+
+def _to_json(p, precision=None, webgl_threshold:int=None) -> bytes:
+    """plotly figure JSON with trace arrays as typed array specs"""
+    if precision not in _PRECISIONS:
+        raise ValueError(f"unknown precision '{precision}', choose from {list(_PRECISIONS)}")
+    if precision in (8, 16):
+        raise ValueError("quantized precision needs format='html', json has no way to decode it")
+    figure = _figure_dict(p, webgl_threshold)
+    found = []
+    _arrays(figure["data"], found)
+    specs = []
+    for a in found:
+        content, dtype, _ = _typed(a, precision)
+        specs.append({"dtype": dtype, "bdata": base64.b64encode(content).decode()})
+    text = to_json_plotly(figure)
+    return re.sub(r'\{"\$spyglass":\s*(\d+)\}',
+                  lambda m: json.dumps(specs[int(m.group(1))]), text).encode()
+
+def _to_html(p, precision=None, webgl_threshold:int=None,
+             shared_data:bool=False, include_plotlyjs=True) -> bytes:
+    """
+    a standalone page decoding the trace arrays before plotting.
+
+    shared_data packs every array into one buffer, decoded once, with
+    arrays repeated across traces (e.g. the true values of every
+    model) stored once
+    """
+    if precision not in _PRECISIONS:
+        raise ValueError(f"unknown precision '{precision}', choose from {list(_PRECISIONS)}")
+    figure = _figure_dict(p, webgl_threshold)
+    found = []
+    _arrays(figure["data"], found)
+    buffers, specs = [], []
+    blob, offset, seen = [], 0, {}
+    for a in found:
+        content, dtype, quantization = _typed(a, precision)
+        quantization = list(quantization) if quantization else []
+        n = len(a)
+        if not shared_data:
+            buffers.append(base64.b64encode(content).decode())
+            specs.append([len(buffers) - 1, 0, n, dtype, *quantization])
+            continue
+        key = (dtype, hashlib.blake2b(content, digest_size=16).digest())
+        if key not in seen:
+            seen[key] = offset
+            blob.append(content)
+            offset += len(content)
+            pad = -offset % 8 #typed array views need aligned offsets
+            blob.append(b"\0" * pad)
+            offset += pad
+        specs.append([0, seen[key], n, dtype, *quantization])
+    if shared_data:
+        buffers = [base64.b64encode(b"".join(blob)).decode()]
+    div = "spyglass-" + hashlib.blake2b(repr(specs).encode(), digest_size=6).hexdigest()
+    if include_plotlyjs == "cdn":
+        plotlyjs = f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+    elif include_plotlyjs:
+        plotlyjs = f'<script type="text/javascript">{get_plotlyjs()}</script>'
+    else:
+        plotlyjs = ""
+    return (_PAGE % dict(plotlyjs=plotlyjs, loader=_LOADER, div=div,
+                         buffers=json.dumps(buffers), specs=json.dumps(specs),
+                         figure=_script_json(figure))).encode()
@@ -3,24 +3,121 @@ import numpy as np
 
 import plotly.express as px
 
-def _make_parity_fig(data:pd.DataFrame, x:str, y:str, **kwargs):
+from ._plotly_encoding import _to_html, _to_json
+
+def _make_parity_fig(data:pd.DataFrame, x:str, y:str, lims:tuple=None,
+                     annotations:dict=None, **kwargs):
     """
     plot an array of one or more figures with an line of slope=1
     overlaid onto each one
+
+    lims fixes the range of every axis, e.g. to match other pages,
+    annotations maps comparisons to lines of text written in their
+    facet
     """
     p = px.scatter(data, x=x, y=y, **kwargs)
-    xlims = min(data[x]), max(data[y])
-    ylims = min(data[y]), max(data[y])
-    p.add_scatter(x = [min(xlims+ylims), max(xlims+ylims)],
-                  y = [min(xlims+ylims), max(xlims+ylims)],
+    if lims is None:
+        lims = (min(np.nanmin(data[x]), np.nanmin(data[y])),
+                max(np.nanmax(data[x]), np.nanmax(data[y])))
+    else:
+        p.update_xaxes(range=lims)
+        p.update_yaxes(range=lims)
+    p.add_scatter(x = list(lims),
+                  y = list(lims),
+                  mode='lines', name="parity", marker={"color":"black"},
+                  row='all', col='all')
+    _annotate_facets(p, annotations)
+    return p
+
+def _annotate_facets(p, annotations:dict=None):
+    """write lines of text under the title of each comparison facet"""
+    for title in list(p.layout.annotations):
+        name = title.text.partition("comparison=")[2]
+        if annotations and name in annotations:
+            p.add_annotation(text="<br>".join(annotations[name]),
+                             x=title.x, y=title.y - .01, xref="paper", yref="paper",
+                             xanchor="center", yanchor="top", showarrow=False,
+                             font=dict(size=10), align="left")
+
+def _make_parity_density(data:pd.DataFrame, x:str, y:str, z:str,
+                         extent:tuple, bins:int, annotations:dict=None, **kwargs):
+    """
+    plot an array of one or more heatmaps of pre-binned counts with a
+    line of slope=1 overlaid onto each one
+
+    a color grouping has no meaning on a heatmap, it is used to facet
+    rows instead
+    """
+    color = kwargs.pop('color', None)
+    kwargs.setdefault('facet_row', color)
+    p = px.density_heatmap(data, x=x, y=y, z=z, histfunc='sum', **kwargs)
+    _set_bins(p, extent, bins)
+    (lo, hi), _ = extent
+    p.add_scatter(x = [lo, hi], y = [lo, hi],
                   mode='lines', name="parity", marker={"color":"black"},
                   row='all', col='all')
+    _annotate_facets(p, annotations)
     return p
 
+def _make_parity_live(data:pd.DataFrame, x:str, y:str, **kwargs):
+    """
+    parity figure whose predictions are replaced in place by
+    _update_parity, as a FigureWidget when anywidget is installed
+
+    data must have a '_row' column of row positions, returns the
+    figure and each scatter trace with the positions it draws
+    """
+    import plotly.graph_objects as go
+    custom_data = list(kwargs.pop('custom_data', [])) + ['_row']
+    p = _make_parity_fig(data, x=x, y=y, custom_data=custom_data, **kwargs)
+    try:
+        p = go.FigureWidget(p)
+    except ImportError: #no widget support, updates show on the next display
+        pass
+    traces = [(trace, np.asarray(trace.customdata)[:, -1].astype(np.intp))
+              for trace in p.data if trace.name != "parity"]
+    return p, traces
+
+def _update_parity(p, traces, xy:np.ndarray, lims:tuple):
+    """swap the predictions of every trace and span the parity line over lims"""
+    with p.batch_update():
+        for trace, rows in traces:
+            trace.y = xy[rows, 1]
+        p.update_traces(x=lims, y=lims, selector=dict(name="parity"))
+    return p
+
+def _set_bins(p, extent, bins):
+    """align the heatmap cells with the grid the counts were binned on"""
+    (x0, x1), (y0, y1) = extent
+    p.update_traces(xbins=dict(start=x0, end=x1, size=(x1-x0)/bins),
+                    ybins=dict(start=y0, end=y1, size=(y1-y0)/bins),
+                    selector=dict(type='histogram2d'))
+
+def _segments(loadings:np.ndarray):
+    """x and y of line segments from the origin, separated by gaps"""
+    xy = np.zeros((len(loadings), 3, 2))
+    xy[:, 1] = loadings
+    xy[:, 2] = np.nan
+    return xy[..., 0].ravel(), xy[..., 1].ravel()
+
+def _add_loadings(p, loadings, features, labelled):
+    """
+    draw every loading vector as one line trace and the names of the
+    labelled ones as one text trace
+    """
+    x, y = _segments(loadings)
+    p.add_scatter(x=x, y=y, mode='lines', name='loadings',
+                  line={"color":"black", "width":1},
+                  hoverinfo='skip', showlegend=False)
+    p.add_scatter(x=loadings[labelled, 0], y=loadings[labelled, 1],
+                  text=features[labelled], mode='text', name='loading labels',
+                  textposition='top center', showlegend=False)
+
 def _make_biplot(*, data:np.ndarray,
                  loadings:np.ndarray,
                  features:np.ndarray,
                  labels:np.ndarray=None,
+                 labelled:np.ndarray=None,
                  **kwargs):
     """
     Project PCA data onto plane. annotate the major components
@@ -29,19 +126,84 @@ def _make_biplot(*, data:np.ndarray,
     p = px.scatter(data, **kwargs)
     p.update_xaxes(title_text=labels[0])
     p.update_yaxes(title_text=labels[1])
-    for i, feature in enumerate(features):
-        p.add_shape(
-            type='line',
-            x0=0, y0=0,
-            x1=loadings[i, 0],
-            y1=loadings[i, 1],
-        )
-        p.add_annotation(
-            x=loadings[i, 0],
-            y=loadings[i, 1],
-            ax=0, ay=0,
-            xanchor="center",
-            yanchor="bottom",
-            text=feature,
-        )
+    _add_loadings(p, loadings, features, labelled)
+    return p
+
+def _make_biplot_density(*, data:pd.DataFrame,
+                         loadings:np.ndarray,
+                         features:np.ndarray,
+                         labels:np.ndarray=None,
+                         labelled:np.ndarray=None,
+                         z:str, extent:tuple, bins:int,
+                         **kwargs):
+    """
+    Heatmap of PCA data binned on the plane. annotate the major
+    components contributing to the plane axes
+    """
+    p = px.density_heatmap(data, z=z, histfunc='sum', **kwargs)
+    _set_bins(p, extent, bins)
+    p.update_xaxes(title_text=labels[0])
+    p.update_yaxes(title_text=labels[1])
+    _add_loadings(p, loadings, features, labelled)
     return p
+
+def _update_biplot(p, *, xy:np.ndarray,
+                   loadings:np.ndarray,
+                   features:np.ndarray,
+                   labels:np.ndarray,
+                   labelled:np.ndarray,
+                   counts:np.ndarray=None,
+                   extent:tuple=None, bins:int=None,
+                   hover_name=None):
+    """
+    replace the points, loadings and axis titles of a biplot figure,
+    and the hover labels of the points with hover_name, in one
+    batched update
+    """
+    x, y = _segments(loadings)
+    with p.batch_update():
+        p.data[0].x = xy[:, 0]
+        p.data[0].y = xy[:, 1]
+        if hover_name is not None and counts is None:
+            p.data[0].hovertext = hover_name
+        if counts is not None:
+            p.data[0].z = counts
+            _set_bins(p, extent, bins)
+        p.update_traces(x=x, y=y, selector=dict(name='loadings'))
+        p.update_traces(x=loadings[labelled, 0], y=loadings[labelled, 1],
+                        text=features[labelled],
+                        selector=dict(name='loading labels'))
+        p.update_xaxes(title_text=labels[0])
+        p.update_yaxes(title_text=labels[1])
+    return p
+
+def _make_scatter_matrix(data:pd.DataFrame, **kwargs):
+    """plot every pair of columns of data against each other"""
+    return px.scatter_matrix(data, **kwargs)
+
+def _export(p, format:str, precision=None, webgl_threshold:int=None,
+            shared_data:bool=False, include_plotlyjs=True) -> bytes:
+    """
+    serialize p as html, json or an image format (needs kaleido)
+
+    html and json are made compact by the options, see
+    _plotly_encoding:
+    - precision :: "float32", or 16 or 8 bits to quantize each array
+      over its range (html only). None keeps float64.
+    - webgl_threshold :: draw scatter traces of more points with WebGL
+    - shared_data :: one data buffer for all traces and facets, arrays
+      repeated across traces stored once (html only)
+    - include_plotlyjs :: True, "cdn" or False, as in plotly's to_html
+    """
+    compact = (precision, webgl_threshold, shared_data) != (None, None, False)
+    if format == "html" and compact:
+        return _to_html(p, precision, webgl_threshold, shared_data, include_plotlyjs)
+    if format == "html":
+        return p.to_html(include_plotlyjs=include_plotlyjs).encode()
+    if format == "json" and shared_data:
+        raise ValueError("shared_data needs format='html'")
+    if format == "json" and compact:
+        return _to_json(p, precision, webgl_threshold)
+    if format == "json":
+        return p.to_json().encode()
+    return p.to_image(format=format)
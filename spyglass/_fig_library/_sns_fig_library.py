@@ -1,65 +1,434 @@
 import pandas as pd
 import numpy as np
 
+import io
+import weakref
+
 import matplotlib.pyplot as plt
 import mplcursors
 import seaborn as sns
+from matplotlib.axes import Axes
+from matplotlib.collections import PathCollection
+
+from . import _uses_pyplot
+from .._utils import _figure, _label_array
+
+def _relabel(kwargs:dict):
+    """translate plotly express style facet and color keywords"""
+    for px_name, sns_name in (('facet_col', 'col'),
+                              ('facet_row', 'row'),
+                              ('facet_col_wrap', 'col_wrap'),
+                              ('color', 'hue')):
+        if px_name in kwargs:
+            kwargs.setdefault(sns_name, kwargs.pop(px_name))
+    return kwargs
+
+def _levels(values:pd.Series) -> list:
+    """facet and hue levels in seaborn's order"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    levels = pd.unique(values.dropna())
+    return sorted(levels) if pd.api.types.is_numeric_dtype(values) else list(levels)
+
+class _Grid():
+    """
+    the parts of a seaborn grid spyglass uses, for figures drawn on
+    their own canvas: figure, axes_dict and set
+    """
+    def __init__(self, figure, axes_dict:dict):
+        self.figure = figure
+        self.axes_dict = axes_dict
+
+    @property
+    def axes(self):
+        return np.array(self.figure.axes)
+
+    def set(self, **kwargs):
+        for ax in self.figure.axes:
+            ax.set(**kwargs)
+        return self
+
+    def savefig(self, *args, **kwargs):
+        self.figure.savefig(*args, **kwargs)
+
+def _tight(figure):
+    """lay figure out tightly, layout engines are matplotlib 3.6+"""
+    if hasattr(figure, "set_layout_engine"):
+        figure.set_layout_engine("tight")
+    else:
+        figure.set_tight_layout(True)
+    return figure
+
+def _facets(plot, data:pd.DataFrame, row=None, col=None, col_wrap:int=None,
+            height:float=5, aspect:float=1, **kwargs) -> _Grid:
+    """
+    the standalone counterpart of sns.relplot and sns.displot: draw
+    plot, an axes level seaborn function, on a grid of shared axes per
+    row and col level. Hue levels and norm are fixed across facets,
+    the legend is drawn on the last one.
+    """
+    rows = _levels(data[row]) if row is not None else [None]
+    cols = _levels(data[col]) if col is not None else [None]
+    cells = [(r, c) for r in rows for c in cols]
+    if col_wrap is not None and row is None:
+        ncols = min(col_wrap, len(cols))
+        nrows = -(-len(cols) // ncols)
+    else:
+        nrows, ncols = len(rows), len(cols)
+    figure = _tight(_figure(figsize=(ncols * height * aspect, nrows * height)))
+    axes = figure.subplots(nrows, ncols, sharex=True, sharey=True, squeeze=False).ravel()
+    for ax in axes[len(cells):]:
+        ax.remove()
+    for ax in axes[max(len(cells) - ncols, 0):len(cells)]: #bottom of each column
+        ax.xaxis.set_tick_params(labelbottom=True)
+    hue = kwargs.get('hue')
+    if hue is not None and isinstance(hue, str):
+        if pd.api.types.is_numeric_dtype(data[hue]):
+            kwargs.setdefault('hue_norm', (data[hue].min(), data[hue].max()))
+        else:
+            kwargs.setdefault('hue_order', _levels(data[hue]))
+    axes_dict = {}
+    for i, ((r, c), ax) in enumerate(zip(cells, axes)):
+        keep = np.ones(len(data), dtype=bool)
+        if row is not None:
+            keep &= (data[row] == r).to_numpy()
+        if col is not None:
+            keep &= (data[col] == c).to_numpy()
+        plot(data=data[keep], ax=ax, legend=i == len(cells) - 1, **kwargs)
+        title = " | ".join(f"{name} = {level}" for name, level in ((row, r), (col, c))
+                           if name is not None)
+        ax.set_title(title)
+        key = (r, c) if row is not None and col is not None else c if col is not None else r
+        axes_dict[key] = ax
+    return _Grid(figure, axes_dict)
+
+def _pairs(data:pd.DataFrame, hue=None, vars=None, height:float=2.5, **kwargs) -> _Grid:
+    """the standalone counterpart of sns.pairplot"""
+    if vars is None:
+        vars = [c for c in data.select_dtypes("number").columns if c != hue]
+    k = len(vars)
+    figure = _tight(_figure(figsize=(k * height, k * height)))
+    axes = figure.subplots(k, k, sharex='col', squeeze=False)
+    if hue is not None:
+        kwargs.setdefault('hue_order', _levels(data[hue]))
+    for i, y in enumerate(vars):
+        for j, x in enumerate(vars):
+            legend = i == 0 and j == k - 1
+            if i == j:
+                sns.histplot(data=data, x=x, hue=hue, ax=axes[i, j], legend=legend,
+                             hue_order=kwargs.get('hue_order'))
+            else:
+                sns.scatterplot(data=data, x=x, y=y, hue=hue, ax=axes[i, j],
+                                legend=legend, **kwargs)
+    return _Grid(figure, {(y, x): axes[i, j] for i, y in enumerate(vars)
+                          for j, x in enumerate(vars)})
 
-def _make_parity_fig(data:pd.DataFrame, x:str, y:str, **kwargs):
+#scatter artist -> (positions of its points in the source data, label column)
+_hover = weakref.WeakKeyDictionary()
+
+def _point_rows(data:pd.DataFrame, x, y, kwargs:dict) -> dict:
+    """
+    facet key -> positions in data of the points its scatter draws, in
+    drawing order: the facet's rows in data order less those seaborn
+    drops for a missing x, y or hue, size or style value. Facets are
+    keyed as in axes_dict, None without facets.
+    """
+    valid = data[x].notna().to_numpy() & data[y].notna().to_numpy()
+    for semantic in ('hue', 'size', 'style'):
+        name = kwargs.get(semantic)
+        if name is not None and np.ndim(name) == 0 and name in data:
+            valid &= data[name].notna().to_numpy()
+    codes = np.zeros(len(data), dtype=np.int64)
+    keys = [()]
+    for facet in (kwargs.get('row'), kwargs.get('col')):
+        if facet is None:
+            continue
+        levels = _levels(data[facet])
+        c = pd.Categorical(data[facet], categories=levels).codes
+        valid &= c >= 0
+        codes = codes * len(levels) + c
+        keys = [key + (level,) for key in keys for level in levels]
+    positions = np.flatnonzero(valid).astype(np.int32 if len(data) < 2**31 else np.int64)
+    order = np.argsort(codes[positions], kind='stable')
+    bounds = np.cumsum(np.bincount(codes[positions], minlength=len(keys)))[:-1]
+    keys = [key if len(key) > 1 else key[0] if key else None for key in keys]
+    return dict(zip(keys, np.split(positions[order], bounds)))
+
+def _hover_points(p, data:pd.DataFrame, x, y, kwargs:dict, hover_name=None):
+    """
+    label hovered points with hover_name, a column of data or values
+    per row, the index of data by default.
+
+    The labels are materialized once and every scatter artist is
+    mapped to the rows it draws, so a hover is two array reads, right
+    on grouped and faceted figures. Only pyplot figures have an event
+    loop to hover in.
+    """
+    if not _uses_pyplot():
+        return None
+    if hover_name is None:
+        labels = data.index
+    elif np.ndim(hover_name) == 0:
+        labels = data[hover_name]
+    else:
+        labels = hover_name
+    labels = _label_array(labels)
+    if isinstance(p, Axes):
+        axes = {None: p}
+    else:
+        axes = p.axes_dict or {None: p.figure.axes[0]}
+    artists = []
+    for key, rows in _point_rows(data, x, y, kwargs).items():
+        points = [c for c in axes[key].collections
+                  if isinstance(c, PathCollection) and c.get_gid() != 'loading']
+        if points and len(points[0].get_offsets()) == len(rows):
+            _hover[points[0]] = (rows, labels)
+            artists.append(points[0])
+    cursor = mplcursors.cursor(artists, multiple=True)
+    cursor.connect("add", _set_label)
+    return cursor
+
+def _set_label(sel):
+    rows, labels = _hover[sel.artist]
+    sel.annotation.set_text(labels[rows[sel.index]])
+
+def _make_parity_fig(data:pd.DataFrame, x:str, y:str, lims:tuple=None,
+                     annotations:dict=None, hover_name=None, **kwargs):
     """
     plot an array of figures with an line of slope=1 overlaid onto
     each one
+
+    lims fixes the range of every axis, e.g. to match other pages,
+    annotations maps comparisons to lines of text written in their
+    facet, hover_name labels hovered points as in _hover_points
     """
-    p = sns.relplot(data=data, x=x, y=y, **kwargs)
+    kwargs = _relabel(kwargs)
+    if _uses_pyplot():
+        p = sns.relplot(data=data, x=x, y=y, **kwargs)
+    else:
+        p = _facets(sns.scatterplot, data, x=x, y=y, **kwargs)
     for ax in p.figure.axes:
         xlims = ax.get_xlim()
         ylims = ax.get_ylim()
         ax.axline((min(xlims+ylims), min(xlims+ylims)),
                   (max(xlims+ylims), max(xlims+ylims)), color='k')
-    #issue: internally plotting is done as a groupby.  then, this
-    #references the absolute index of the plot marker and goes and
-    #looks for the number in the full data set (values towards the end
-    #are never found). simply grouping the data now can't work because
-    #the indices could then mismatch. selection must be obtained with
-    #consciousness of the group somehow...
-    mplcursors.cursor(multiple = True).connect(
-        "add", lambda sel: sel.annotation.set_text(
-            #sel.index
-            data["Formula"].iloc[sel.index]
-        )
-    )
+    if lims is not None:
+        p.set(xlim=lims, ylim=lims)
+    _annotate_facets(p, annotations)
+    _hover_points(p, data, x, y, kwargs, hover_name)
+    return p
+
+def _annotate_facets(p, annotations:dict=None):
+    """write lines of text in the top left corner of each comparison facet"""
+    for key, ax in p.axes_dict.items() if annotations else ():
+        name = key[-1] if isinstance(key, tuple) else key
+        if name in annotations:
+            ax.text(.02, .98, "\n".join(annotations[name]), transform=ax.transAxes,
+                    ha="left", va="top", fontsize="small")
+
+def _make_parity_density(data:pd.DataFrame, x:str, y:str, z:str,
+                         extent:tuple, bins:int, annotations:dict=None, **kwargs):
+    """
+    plot an array of heatmaps of pre-binned counts with a line of
+    slope=1 overlaid onto each one
+
+    a hue grouping has no meaning on a heatmap, it is used to facet
+    rows instead
+    """
+    kwargs = _relabel(kwargs)
+    hue = kwargs.pop('hue', None)
+    kwargs.setdefault('row', hue)
+    if _uses_pyplot():
+        p = sns.displot(data=data, x=x, y=y, weights=z,
+                        bins=bins, binrange=extent, **kwargs)
+    else:
+        p = _facets(sns.histplot, data, x=x, y=y, weights=z,
+                    bins=bins, binrange=extent, **kwargs)
+    (lo, hi), _ = extent
+    for ax in p.figure.axes:
+        ax.axline((lo, lo), (hi, hi), color='k')
+    _annotate_facets(p, annotations)
+    return p
+
+class _Blitter():
+    """
+    draw animated artists over a background cached on every full
+    draw, so they can be redrawn alone
+    """
+    def __init__(self, figure, artists):
+        self.figure = figure
+        self.artists = artists
+        self.background = None
+        for artist, _ in artists:
+            artist.set_animated(True)
+        figure.canvas.mpl_connect("draw_event", self.ondraw)
+
+    def ondraw(self, event):
+        if not event.canvas.is_saving():
+            self.background = event.canvas.copy_from_bbox(self.figure.bbox)
+        for artist, _ in self.artists:
+            artist.draw(event.renderer)
+
+    def blit(self):
+        canvas = self.figure.canvas
+        if self.background is None or not canvas.supports_blit:
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self.background)
+            for artist, _ in self.artists:
+                self.figure.draw_artist(artist)
+            canvas.blit(self.figure.bbox)
+        canvas.flush_events()
+
+def _make_parity_live(data:pd.DataFrame, x:str, y:str, **kwargs):
+    """
+    parity figure whose predictions are replaced in place by
+    _update_parity
+
+    data must have a '_row' column of row positions, returns the
+    grid and a _Blitter of each axes' points with the positions they
+    draw. Updating in place needs a GUI canvas, so the figure is
+    always made through pyplot.
+    """
+    p = sns.relplot(data=data, x=x, y=y, **_relabel(kwargs))
+    rows = {}
+    for (i, j, _), subset in p.facet_data():
+        rows.setdefault((i, j), []).append(subset['_row'].to_numpy())
+    artists = [(p.facet_axis(i, j).collections[0], np.sort(np.concatenate(r)))
+               for (i, j), r in rows.items()]
+    for ax in p.figure.axes:
+        ax.axline((0, 0), (1, 1), color='k')
+    return p, _Blitter(p.figure, artists)
+
+def _update_parity(p, blitter, xy:np.ndarray, lims:tuple):
+    """
+    swap the predictions of every axes and blit them, axes whose view
+    no longer holds lims are rescaled and drawn in full
+    """
+    rescale = False
+    for points, rows in blitter.artists:
+        points.set_offsets(xy[rows])
+        ax = points.axes
+        (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+        if max(x0, y0) > lims[0] or min(x1, y1) < lims[1]:
+            ax.update_datalim([(lims[0], lims[0]), (lims[1], lims[1])])
+            ax.autoscale_view()
+            rescale = True
+    if rescale:
+        p.figure.canvas.draw_idle()
+        p.figure.canvas.flush_events()
+    else:
+        blitter.blit()
     return p
 
+def _axes(kwargs:dict) -> dict:
+    """kwargs drawing on the axes given, pyplot's current ones or a standalone figure's"""
+    if kwargs.get('ax') is None and not _uses_pyplot():
+        kwargs['ax'] = _figure().subplots()
+    return kwargs
+
+def _add_loadings(ax, loadings, features, labelled):
+    """
+    draw every loading vector as one quiver and label the labelled
+    ones
+    """
+    ax.quiver(np.zeros(len(loadings)), np.zeros(len(loadings)),
+              loadings[:, 0], loadings[:, 1],
+              angles='xy', scale_units='xy', scale=1,
+              color='k', alpha=0.5, gid='loading')
+    for (x, y), feature in zip(loadings[labelled], features[labelled]):
+        ax.text(x, y, feature,
+                color = 'k', ha = 'center', va = 'center', gid = 'loading')
+    ax.update_datalim(np.vstack([loadings, [[0, 0]]]))
+    ax.autoscale_view()
+
 def _make_biplot(*, data:np.ndarray,
                  loadings:np.ndarray,
                  features:np.ndarray,
                  labels:np.ndarray=None,
+                 labelled:np.ndarray=None,
+                 hover_name=None,
                  **kwargs):
     """
     Project PCA data onto plane. annotate the major components
-    contributing to the plane axes
+    contributing to the plane axes. hover_name labels hovered points
+    as in _hover_points
     """
     data = pd.DataFrame(data)
-    p = sns.scatterplot(data=data, **kwargs)
-    for i, features in enumerate(features):
-        p.figure.axes[0].arrow(
-            0, 0,
-            loadings[i,0],
-            loadings[i,1],
-            color = 'k', alpha = 0.5
-        )
-        p.figure.axes[0].text(
-            loadings[i,0],
-            loadings[i,1],
-            data.columns[i],
-            color = 'k', ha = 'center', va = 'center'
-        )
-
-    mplcursors.cursor(multiple = True).connect(
-        "add", lambda sel: sel.annotation.set_text(
-            #sel.index
-            pcadata.index.get_level_values(level=0)[sel.index]
-        )
-    )
+    p = sns.scatterplot(data=data, **_axes(kwargs))
+    _add_loadings(p, loadings, features, labelled)
+    _hover_points(p, data, kwargs['x'], kwargs['y'], kwargs, hover_name)
+    return p
 
+def _make_biplot_density(*, data:pd.DataFrame,
+                         loadings:np.ndarray,
+                         features:np.ndarray,
+                         labels:np.ndarray=None,
+                         labelled:np.ndarray=None,
+                         z:str, extent:tuple, bins:int,
+                         **kwargs):
+    """
+    Heatmap of PCA data binned on the plane. annotate the major
+    components contributing to the plane axes
+    """
+    p = sns.histplot(data=data, weights=z, bins=bins, binrange=extent,
+                     **_axes(kwargs))
+    p.set_xlabel(labels[0])
+    p.set_ylabel(labels[1])
+    _add_loadings(p, loadings, features, labelled)
     return p
+
+def _update_biplot(ax, *, xy:np.ndarray,
+                   loadings:np.ndarray,
+                   features:np.ndarray,
+                   labels:np.ndarray,
+                   labelled:np.ndarray,
+                   counts:np.ndarray=None,
+                   extent:tuple=None, bins:int=None,
+                   hover_name=None):
+    """
+    replace the points, loadings and axis titles of a biplot axes,
+    and the hover labels of the points with hover_name
+    """
+    points = [c for c in ax.collections if c.get_gid() != 'loading'][0]
+    if counts is None:
+        points.set_offsets(xy)
+        if points in _hover and hover_name is not None:
+            #set_offsets keeps every row, missing ones included
+            _hover[points] = (np.arange(len(xy), dtype=np.int32), _label_array(hover_name))
+    else: #a QuadMesh can't be rebinned, draw it again
+        points.remove()
+        sns.histplot(x=xy[:, 0], y=xy[:, 1], weights=counts,
+                     bins=bins, binrange=extent, ax=ax)
+    quiver = [c for c in ax.collections if c.get_gid() == 'loading'][0]
+    quiver.set_UVC(loadings[:, 0], loadings[:, 1])
+    for text in [t for t in ax.texts if t.get_gid() == 'loading']:
+        text.remove()
+    for (x, y), feature in zip(loadings[labelled], features[labelled]):
+        ax.text(x, y, feature,
+                color = 'k', ha = 'center', va = 'center', gid = 'loading')
+    ax.set_xlabel(labels[0])
+    ax.set_ylabel(labels[1])
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(np.vstack([xy, loadings, [[0, 0]]]))
+    ax.autoscale_view()
+    ax.figure.canvas.draw_idle()
+    return ax
+
+def _make_scatter_matrix(data:pd.DataFrame, **kwargs):
+    """plot every pair of columns of data against each other"""
+    if _uses_pyplot():
+        return sns.pairplot(data, **_relabel(kwargs))
+    return _pairs(data, **_relabel(kwargs))
+
+def _export(p, format:str, **options) -> bytes:
+    """
+    save the figure of p, an Axes or seaborn grid, as format and close
+    it. options go to savefig, e.g. dpi
+    """
+    figure = getattr(p, "figure", p)
+    buf = io.BytesIO()
+    figure.savefig(buf, format=format, **options)
+    if _uses_pyplot():
+        plt.close(figure)
+    return buf.getvalue()
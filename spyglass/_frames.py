@@ -0,0 +1,78 @@
+"""
+pandas, Polars, Arrow and NumPy inputs without conversion copies
+
+Polars and pyarrow are never imported unless the caller passed their
+objects, which are recognized by module name.
+"""
+import pandas as pd
+import numpy as np
+
+def _kind(obj) -> str:
+    """'pandas', 'polars', 'arrow' or 'numpy'"""
+    module = type(obj).__module__.split('.')[0]
+    if module == 'pyarrow':
+        return 'arrow'
+    if module in ('pandas', 'polars'):
+        return module
+    return 'numpy'
+
+def _columns(y) -> list:
+    """column names of a frame or structured array, generated for plain arrays"""
+    kind = _kind(y)
+    if kind == 'pandas':
+        return list(y.columns) if isinstance(y, pd.DataFrame) else [y.name]
+    if kind == 'polars':
+        return list(y.columns) if hasattr(y, 'columns') else [y.name]
+    if kind == 'arrow':
+        return list(y.column_names)
+    y = np.asarray(y)
+    if y.dtype.names is not None:
+        return list(y.dtype.names)
+    return ['y'] if y.ndim == 1 else [f'y{j}' for j in range(y.shape[1])]
+
+def _column_arrays(y) -> list:
+    """
+    one 1D array per column, views of the caller's buffers where the
+    library allows it (numeric columns without nulls)
+    """
+    kind = _kind(y)
+    if kind == 'pandas':
+        if isinstance(y, pd.Series):
+            return [y.to_numpy()]
+        return [y.iloc[:, j].to_numpy() for j in range(y.shape[1])]
+    if kind == 'polars':
+        if not hasattr(y, 'columns'):
+            return [y.to_numpy()]
+        return [y.get_column(c).to_numpy() for c in y.columns]
+    if kind == 'arrow':
+        return [y.column(j).to_numpy() for j in range(y.num_columns)]
+    y = np.asarray(y)
+    if y.dtype.names is not None:
+        return [y[name] for name in y.dtype.names]
+    return [y] if y.ndim == 1 else [y[:, j] for j in range(y.shape[1])]
+
+def _index(y) -> pd.Index:
+    """row labels, positions for frames without an index"""
+    if _kind(y) == 'pandas':
+        return y.index
+    return pd.RangeIndex(len(y))
+
+def _as_input(X):
+    """
+    X as an estimator can take it. Arrow tables become pandas frames
+    with one block per column, sharing buffers where possible, so
+    feature names are kept. Everything else is passed as is.
+    """
+    if _kind(X) == 'arrow':
+        return X.to_pandas(split_blocks=True)
+    return X
+
+def _to_kind(data:pd.DataFrame, kind:str):
+    """a long-form frame in the frame type the caller passed"""
+    if kind == 'polars':
+        import polars as pl
+        return pl.from_pandas(data, include_index=False)
+    if kind == 'arrow':
+        import pyarrow as pa
+        return pa.Table.from_pandas(data, preserve_index=False)
+    return data
@@ -0,0 +1,109 @@
+""" regression metrics accumulated block by block, in one pass over predictions"""
+import pandas as pd
+import numpy as np
+
+import threading
+
+#rows per block, bounds the temporaries of one update
+BLOCKSIZE = 2**16
+
+class _Metrics():
+    """
+    MAE, RMSE, R² and max error per partition and target, updated
+    from blocks of true and predicted values. Predictions of several
+    models are told apart by their model name.
+
+    Sums of errors are added up, the mean and squared deviations of
+    the true values (for R²) are merged with Chan's parallel update,
+    so the result does not depend on how predictions were chunked.
+    NaN pairs are skipped. Blocks may be added from several threads.
+    """
+    def __init__(self, targets:list):
+        self.targets = list(targets)
+        self.stats = {} #(model, partition) -> n, abs, sq, max, mean, m2 arrays per target
+        self.observed = set() #(estimator, X) identities fed by observer
+        self.lock = threading.Lock()
+
+    def add(self, partition, trues:list, y_pred, model=None, start:int=0):
+        """
+        update partition with the (rows, targets) predictions of the
+        rows from start of trues, one 1D array per target
+        """
+        k = len(self.targets)
+        y_pred = np.reshape(y_pred, (-1, k))
+        for lo in range(0, len(y_pred), BLOCKSIZE):
+            pred = y_pred[lo:lo+BLOCKSIZE]
+            rows = slice(start + lo, start + lo + len(pred))
+            true = np.column_stack([t[rows] for t in trues]).astype(float)
+            self._merge((model, partition), true, pred)
+
+    def observer(self, partitions:dict, models:dict=None):
+        """
+        an observe callback for _predict, adding each block of
+        predictions as it is made. partitions maps id(X) to the
+        partition name and target arrays of X, models id(estimator)
+        to model names.
+        """
+        def observe(estimator, X, start, block):
+            name, trues = partitions[id(X)]
+            model = None if models is None else models[id(estimator)]
+            self.add(name, trues, block, model=model, start=start)
+            with self.lock:
+                self.observed.add((id(estimator), id(X)))
+        return observe
+
+    def _merge(self, partition, true:np.ndarray, pred:np.ndarray):
+        valid = ~(np.isnan(true) | np.isnan(pred))
+        err = np.where(valid, np.abs(pred - true), 0)
+        n = valid.sum(axis=0)
+        mean = np.where(valid, true, 0).sum(axis=0) / np.maximum(n, 1)
+        block = dict(n=n, abs=err.sum(axis=0), sq=(err**2).sum(axis=0),
+                     max=np.where(valid, err, -np.inf).max(axis=0), mean=mean,
+                     m2=(np.where(valid, true - mean, 0)**2).sum(axis=0))
+        with self.lock:
+            self._combine(partition, block)
+
+    def _combine(self, partition, block:dict):
+        n, mean = block['n'], block['mean']
+        if partition not in self.stats:
+            self.stats[partition] = block
+            return
+        a = self.stats[partition]
+        total = a['n'] + n
+        delta = mean - a['mean']
+        share = n / np.maximum(total, 1)
+        self.stats[partition] = dict(
+            n=total, abs=a['abs'] + block['abs'], sq=a['sq'] + block['sq'],
+            max=np.maximum(a['max'], block['max']),
+            mean=a['mean'] + delta * share,
+            m2=a['m2'] + block['m2'] + delta**2 * a['n'] * share,
+        )
+
+    def table(self) -> pd.DataFrame:
+        """one row per partition and target, and per model if they were named"""
+        rows = []
+        comparisons = [str(t)+"_pred" for t in self.targets]
+        named = any(model is not None for model, _ in self.stats)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for (model, partition), s in self.stats.items():
+                rows.append(pd.DataFrame({
+                    **({'model': model} if named else {}),
+                    'partition': partition,
+                    'comparison': comparisons,
+                    'n': s['n'],
+                    'mae': s['abs'] / s['n'],
+                    'rmse': np.sqrt(s['sq'] / s['n']),
+                    'r2': 1 - s['sq'] / s['m2'],
+                    'max_error': np.where(s['n'] > 0, s['max'], np.nan),
+                }))
+        return pd.concat(rows, ignore_index=True)
+
+def _annotations(table:pd.DataFrame) -> dict:
+    """facet annotation lines per comparison"""
+    lines = {}
+    for row in table.itertuples():
+        name = f"{row.model} {row.partition}" if 'model' in table else row.partition
+        lines.setdefault(row.comparison, []).append(
+            f"{name}: MAE {row.mae:.3g} RMSE {row.rmse:.3g} R² {row.r2:.3f}"
+        )
+    return lines
@@ -0,0 +1,172 @@
+""" opt-in timing and profiling of plotting calls"""
+import pandas as pd
+
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_hooks = []
+_local = threading.local()
+
+def add_hook(callback):
+    """
+    call callback(record) after every parityplot, biplot, Biplot,
+    correlation and corrmap call, made on any thread. record is a
+    dict of:
+    - function :: the name of the call
+    - seconds :: its wall time
+    - peak_bytes :: its peak traced memory, when tracemalloc is tracing
+    - stages :: dicts of stage, seconds, rows and peak_bytes in order
+    """
+    _hooks.append(callback)
+
+def remove_hook(callback):
+    _hooks.remove(callback)
+
+def _thread_hooks() -> list:
+    """hooks of the calls made on this thread only, as profile blocks"""
+    if not hasattr(_local, "hooks"):
+        _local.hooks = []
+    return _local.hooks
+
+def _peak(start:tuple) -> int:
+    """
+    peak traced memory since start, a get_traced_memory() snapshot.
+    Before Python 3.9 the peak cannot be reset, so an older peak
+    leaves only the current memory as a lower bound.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    return peak if peak > start[1] else current
+
+def _reset_peak():
+    if hasattr(tracemalloc, "reset_peak"): #Python 3.9
+        tracemalloc.reset_peak()
+
+class _Off():
+    """stand-in call and stage while no hook is registered"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_OFF = _Off()
+
+class _Call():
+    def __init__(self, function:str):
+        self.record = {"function": function, "stages": []}
+        self.outer = getattr(_local, "call", None)
+
+    def __enter__(self):
+        if self.outer is None: #nested calls are staged in the outer one
+            _local.call = self
+            self.start_memory = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+            self.base = self.start_memory[0]
+            self.peak = 0
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.outer is not None:
+            return False
+        _local.call = None
+        self.record["seconds"] = time.perf_counter() - self.start
+        if tracemalloc.is_tracing():
+            self.record["peak_bytes"] = max(self.peak, _peak(self.start_memory) - self.base)
+        for hook in list(_hooks) + list(_thread_hooks()):
+            hook(self.record)
+        return False
+
+class _Stage():
+    def __init__(self, call:_Call, name:str, rows:int):
+        self.call = call
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            _reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()
+            self.base = self.start_memory[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage = {"stage": self.name,
+                 "seconds": time.perf_counter() - self.start,
+                 "rows": self.rows}
+        if self.tracing:
+            peak = _peak(self.start_memory)
+            stage["peak_bytes"] = peak - self.base
+            self.call.peak = max(self.call.peak, peak - self.call.base)
+        self.call.record["stages"].append(stage)
+        return False
+
+def _call(function:str):
+    """instrument a public call, free while no hook is registered"""
+    return _Call(function) if _hooks or _thread_hooks() else _OFF
+
+def _stage(name:str, rows:int=None):
+    """time a stage of the current call, set .rows on it if only known after"""
+    call = getattr(_local, "call", None)
+    return _OFF if call is None else _Stage(call, name, rows)
+
+class Profile():
+    """
+    the records of the calls made in a profile block, and the
+    cProfile statistics when requested, as pstats.Stats
+    """
+    def __init__(self):
+        self.records = []
+        self.stats = None
+
+    def __call__(self, record:dict):
+        self.records.append(record)
+
+    def frame(self) -> pd.DataFrame:
+        """one row per stage of every call"""
+        return pd.DataFrame([{"call": i, "function": record["function"], **stage}
+                             for i, record in enumerate(self.records)
+                             for stage in record["stages"]])
+
+@contextmanager
+def profile(cprofile:bool=False, memory:bool=False):
+    """
+    record stage timings of the plotting calls made in the block,
+    e.g. prediction, frame building, binning and figure construction
+
+    with spyglass.profile(memory=True) as prof:
+        spyglass.parityplot(...)
+    prof.frame()
+
+    memory traces allocations with tracemalloc to report peak memory
+    per stage, cprofile profiles the whole block into prof.stats.
+    Both slow the calls down, only the stage timings are cheap.
+
+    Only the calls made on the thread running the block are recorded.
+    """
+    prof = Profile()
+    hooks = _thread_hooks()
+    hooks.append(prof)
+    trace = memory and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield prof
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            prof.stats = pstats.Stats(profiler)
+        if trace:
+            tracemalloc.stop()
+        hooks.remove(prof)
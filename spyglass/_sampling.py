@@ -0,0 +1,140 @@
+""" bounded samples of the points drawn by scatter-based plots"""
+import numpy as np
+
+class _Reservoir():
+    """
+    Uniform sample of at most size rows from a stream of blocks.
+
+    Every row is given a random key and the rows with the smallest
+    keys are kept, so each block is merged in one vectorized step.
+    """
+    def __init__(self, size:int, seed=None):
+        if size is not None and size < 1:
+            raise ValueError(f"sample must be at least 1 point, or None for every point, not {size}")
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.index = np.empty(0, dtype=np.intp)
+        self.rows = None
+
+    def add(self, block:np.ndarray, offset:int):
+        """offer the rows of block, numbered from offset in the stream"""
+        keys = self.rng.random(len(block))
+        index = np.arange(offset, offset + len(block))
+        if self.rows is None:
+            self.rows = block[:0]
+        if len(self.keys) == self.size: #only rows that can displace one
+            take = keys < self.keys.max()
+            keys, index, block = keys[take], index[take], block[take]
+        keys = np.concatenate([self.keys, keys])
+        index = np.concatenate([self.index, index])
+        rows = np.concatenate([self.rows, block])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, index, rows = keys[keep], index[keep], rows[keep]
+        self.keys, self.index, self.rows = keys, index, rows
+
+    def sample(self):
+        """stream positions and rows of the sample, in stream order"""
+        order = np.argsort(self.index)
+        return self.index[order], self.rows[order]
+
+def _caps(counts:np.ndarray, size:int) -> np.ndarray:
+    """
+    points to take from each stratum, exactly size in total: small
+    strata are kept whole, the others capped at one common size, the
+    remainder of the division taken one each from the largest
+    """
+    if counts.sum() <= size:
+        return counts
+    c = np.sort(counts)
+    m = len(c)
+    below = np.concatenate([[0], np.cumsum(c)[:-1]]) #total of the smaller strata
+    totals = below + c * (m - np.arange(m)) #total when capped at each c
+    k = np.searchsorted(totals, size, side='right')
+    cap, left = divmod(size - below[k], m - k)
+    caps = np.minimum(counts, cap)
+    #the m - k capped strata all hold more than cap
+    caps[np.argsort(-counts, kind='stable')[:left]] += 1
+    return caps
+
+def _outliers(scores:np.ndarray, quantile:float, groups:np.ndarray) -> np.ndarray:
+    """mask of the scores beyond the quantile of their group"""
+    limits = np.full(groups.max() + 1, np.inf)
+    for g in np.unique(groups):
+        limits[g] = np.nanquantile(scores[groups == g], quantile)
+    return scores > limits[groups]
+
+def _strata(x:np.ndarray, y:np.ndarray, groups:np.ndarray, bins:int=16) -> np.ndarray:
+    """
+    stratum of every point: its group and its cell of a bins x bins
+    grid spanning the group's points
+    """
+    k = groups.max() + 1
+    strata = groups.astype(np.int64) * bins * bins
+    for v, scale in ((x, bins), (y, 1)):
+        lo, hi = np.full(k, np.inf), np.full(k, -np.inf)
+        np.fmin.at(lo, groups, v)
+        np.fmax.at(hi, groups, v)
+        span = np.where(hi > lo, hi - lo, 1)
+        cell = np.nan_to_num((v - lo[groups]) / span[groups] * bins, nan=0)
+        strata += scale * np.clip(cell.astype(np.int64), 0, bins - 1)
+    return strata
+
+def _subsample(scores:np.ndarray, strata:np.ndarray, groups:np.ndarray,
+               size:int, quantile:float=.99, seed=0) -> np.ndarray:
+    """
+    positions of at most size points, in order: every point scoring
+    beyond the quantile of its group, the highest scoring if
+    they are too many, and the rest drawn at random evenly across
+    strata
+    """
+    n = len(scores)
+    if n <= size:
+        return np.arange(n)
+    outliers = _outliers(scores, quantile, groups)
+    kept = np.flatnonzero(outliers)
+    if len(kept) >= size:
+        return np.sort(kept[np.argpartition(-scores[kept], size - 1)[:size]])
+    rest = np.flatnonzero(~outliers)
+    _, stratum, counts = np.unique(strata[rest], return_inverse=True, return_counts=True)
+    caps = _caps(counts, size - len(kept))
+    #random order within strata, take each stratum's first caps points
+    order = np.lexsort((np.random.default_rng(seed).random(len(rest)), stratum))
+    stratum = stratum[order]
+    rank = np.arange(len(rest)) - np.searchsorted(stratum, stratum)
+    return np.sort(np.concatenate([kept, rest[order[rank < caps[stratum]]]]))
+
+def _sample_parity(data, size:int, quantile:float=.99, seed=0, preds=('pred',)) -> np.ndarray:
+    """
+    positions of the rows of a parity frame to draw: residual
+    outliers of each comparison and partition kept, the rest
+    stratified by comparison, partition and density cell
+
+    with several prediction columns a row is scored by its largest
+    residual and stratified on the first
+    """
+    true, pred = data['true'].to_numpy(), data[preds[0]].to_numpy()
+    partitions = len(data['partition'].cat.categories)
+    groups = (np.maximum(data['comparison'].cat.codes.to_numpy(), 0).astype(np.int64) * partitions
+              + np.maximum(data['partition'].cat.codes.to_numpy(), 0))
+    scores = np.abs(pred - true)
+    for other in preds[1:]:
+        scores = np.fmax(scores, np.abs(data[other].to_numpy() - true))
+    return _subsample(scores, _strata(true, pred, groups), groups, size, quantile, seed)
+
+def _mahalanobis(xy:np.ndarray) -> np.ndarray:
+    """Mahalanobis distance of every point from the centroid"""
+    finite = np.isfinite(xy).all(axis=1)
+    centered = xy - xy[finite].mean(axis=0)
+    inverse = np.linalg.pinv(np.cov(centered[finite], rowvar=False))
+    return np.sqrt(np.einsum('ij,jk,ik->i', centered, inverse, centered))
+
+def _sample_plane(xy:np.ndarray, size:int, quantile:float=.99, seed=0) -> np.ndarray:
+    """
+    positions of the points of a projection plane to draw:
+    Mahalanobis outliers kept, the rest stratified by density cell
+    """
+    groups = np.zeros(len(xy), dtype=np.int64)
+    return _subsample(_mahalanobis(xy), _strata(xy[:, 0], xy[:, 1], groups),
+                      groups, size, quantile, seed)
@@ -0,0 +1,101 @@
+""" declarative figures which either backend can render"""
+import pandas as pd
+import numpy as np
+
+import hashlib
+import os
+import pickle
+
+from ._cache import _hash_data, FigureCache, figure_cache
+from ._fig_library import get_backend, _uses_pyplot, _load
+
+#figure kinds and the backend function drawing them
+_MAKERS = {
+    'parity': '_make_parity_fig',
+    'parity_density': '_make_parity_density',
+    'biplot': '_make_biplot',
+    'biplot_density': '_make_biplot_density',
+    'scatter_matrix': '_make_scatter_matrix',
+}
+
+def _hash_value(v) -> bytes:
+    if isinstance(v, (np.ndarray, pd.DataFrame, pd.Series)):
+        return _hash_data(v).encode()
+    return pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+
+class FigureSpec():
+    """
+    What a figure shows, without drawing it: its kind, a reference to
+    the data drawn and the plot parameters.
+
+    Specs are made by parityplot, biplot and Biplot.spec. Rendering
+    a spec again, with either backend, replaces copying a drawn
+    figure, and a spec pickles as just its data and parameters.
+
+    export() caches the serialized figure on disk keyed by key(),
+    so figures requested repeatedly are only drawn once.
+    """
+    def __init__(self, kind:str, data, **params):
+        if kind not in _MAKERS:
+            raise ValueError(f"unknown kind '{kind}', choose from {list(_MAKERS)}")
+        self.kind = kind
+        self.data = data
+        self.params = params
+
+    def __repr__(self):
+        return f"FigureSpec({self.kind!r}, <{type(self.data).__name__}>, {sorted(self.params)})"
+
+    def key(self, backend:str=None, **options) -> str:
+        """hash of the spec content, the backend, current one by default, and export options"""
+        from . import __version__
+        h = hashlib.blake2b(digest_size=16)
+        #standalone seaborn figures are laid out by spyglass, not seaborn
+        h.update(pickle.dumps((__version__, backend or get_backend(), _uses_pyplot(), self.kind)))
+        h.update(_hash_data(self.data).encode())
+        for name in sorted(self.params):
+            h.update(name.encode())
+            h.update(_hash_value(self.params[name]))
+        h.update(pickle.dumps(sorted(options.items())))
+        return h.hexdigest()
+
+    def render(self, backend:str=None):
+        """draw the figure with backend, the current one by default"""
+        return getattr(_load(backend), _MAKERS[self.kind])(data=self.data, **self.params)
+
+    def export(self, format:str="png", backend:str=None, cache=None, **options) -> bytes:
+        """
+        the figure serialized as format: an image format the backend
+        can save, or "html"/"json" for plotly.
+
+        options go to the backend: savefig keywords such as dpi for
+        seaborn, for plotly html and json the compact encodings
+        - precision :: "float32", or 8 or 16 to quantize every array to
+          that many bits over its range (html only)
+        - webgl_threshold :: scatter traces of more points use WebGL
+        - shared_data :: one data buffer for every trace and facet,
+          repeated arrays stored once (html only)
+        - include_plotlyjs :: True, "cdn" or False
+
+        cache may be None (no caching), True (the shared
+        spyglass.figure_cache) or a spyglass.FigureCache
+        """
+        backend = backend or get_backend()
+        if cache is True:
+            cache = figure_cache
+        if cache:
+            key = f"{backend}-{self.key(backend, **options)}"
+            content = cache.get(key, format)
+            if content is not None:
+                return content
+        content = _load(backend)._export(self.render(backend), format, **options)
+        if cache:
+            cache.put(key, format, content)
+        return content
+
+    def save(self, path:str, backend:str=None, cache=None, **options):
+        """write the figure to path, its extension picks the format, options as in export"""
+        format = os.path.splitext(path)[1][1:].lower()
+        content = self.export(format, backend=backend, cache=cache, **options)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
@@ -0,0 +1,98 @@
+""" out-of-core iteration over inputs too large for memory"""
+import pandas as pd
+import numpy as np
+
+import os
+import tempfile
+import weakref
+
+from ._sampling import _Reservoir
+from ._frames import _kind
+
+#rows per block when streaming and no chunksize is given
+CHUNKSIZE = 2**16
+
+def _is_stream(data, chunksize:int=None) -> bool:
+    """whether data must be processed in blocks, memmaps are out-of-core already"""
+    return (chunksize is not None
+            or isinstance(data, (str, os.PathLike, np.memmap))
+            or not hasattr(data, "__len__"))
+
+def _iter_chunks(data, chunksize:int=None):
+    """
+    yield row blocks of data, which may be:
+    - a Parquet file path (requires pyarrow)
+    - an array, numpy.memmap, pandas or Polars DataFrame, sliced into views
+    - an Arrow table, in record batches
+    - any iterable of blocks, e.g. an Arrow RecordBatchReader, passed
+      through as is but for Arrow batches, yielded as pandas frames
+    """
+    chunksize = chunksize or CHUNKSIZE
+    if isinstance(data, (str, os.PathLike)):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("reading Parquet files requires pyarrow") from e
+        for batch in pq.ParquetFile(data).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif isinstance(data, (np.ndarray, pd.DataFrame)):
+        rows = data.iloc if isinstance(data, pd.DataFrame) else data
+        for start in range(0, len(data), chunksize):
+            yield rows[start:start+chunksize]
+    elif _kind(data) == 'polars':
+        yield from data.iter_slices(chunksize)
+    elif _kind(data) == 'arrow' and hasattr(data, 'to_batches'): #tables, readers are iterated
+        for batch in data.to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas(split_blocks=True)
+    else:
+        for chunk in data:
+            yield chunk.to_pandas(split_blocks=True) if _kind(chunk) == 'arrow' else chunk
+
+def _remove(path:str):
+    """delete a temporary file, left behind if it is still mapped (Windows)"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _transform_stream(transform, chunks, out:str=None, sample:int=None, seed=None):
+    """
+    Apply transform to each chunk and append the results to the raw
+    file out (a temporary file if None, removed once the returned
+    memmap is collected). Only one chunk is in memory at a time, empty
+    chunks are skipped.
+
+    returns:
+    - the results, memory mapped from out
+    - the per-column (min, max) of the results
+    - a uniform _Reservoir sample of the result rows
+    """
+    temporary = out is None
+    if temporary:
+        fd, out = tempfile.mkstemp(prefix="spyglass-", suffix=".dat")
+        os.close(fd)
+    reservoir = _Reservoir(sample, seed)
+    n, lo, hi, block = 0, None, None, None
+    try:
+        with open(out, "wb") as f:
+            for chunk in chunks:
+                if len(chunk) == 0: #estimators reject empty blocks, nanmin too
+                    continue
+                block = np.asarray(transform(chunk))
+                block.tofile(f)
+                lo = np.nanmin(block, axis=0) if lo is None else np.fmin(lo, np.nanmin(block, axis=0))
+                hi = np.nanmax(block, axis=0) if hi is None else np.fmax(hi, np.nanmax(block, axis=0))
+                if sample:
+                    reservoir.add(block, n)
+                n += len(block)
+        if block is None:
+            raise ValueError("no data to transform, every block is empty")
+    except BaseException:
+        if temporary:
+            _remove(out)
+        raise
+    result = np.memmap(out, dtype=block.dtype, mode="r+",
+                       shape=(n,) + block.shape[1:])
+    if temporary: #slices hold the memmap through .base
+        weakref.finalize(result, _remove, out)
+    return result, list(zip(lo, hi)), reservoir
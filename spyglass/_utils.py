@@ -3,34 +3,344 @@ import pandas as pd
 import numpy as np
 
 import io
+import os
+import re
 import pickle
+import warnings
 from itertools import zip_longest
+from contextlib import contextmanager
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from ._frames import _columns, _column_arrays, _index
 
 def _grouper(iterable, chunksize):
     "Collect data into non-overlapping fixed-length chunks or blocks"
     args = [iter(iterable)] * chunksize
     return zip(*args)
 
-def _build_frame(y_pred:np.ndarray, y_true:pd.DataFrame):
+def _predict(estimator, X, chunksize:int=None, estimator_kwargs:dict={}, observe=None):
+    """
+    Predict on X, optionally in blocks of chunksize rows. Blocks are
+    written into one preallocated output in order, so only a single
+    block of estimator scratch is alive at a time.
+
+    observe(estimator, X, start, block) is called with each block of
+    predictions as it is made, starting at row start of X.
+    """
+    if chunksize is None or len(X) <= chunksize:
+        out = estimator.predict(X, **estimator_kwargs)
+        if observe is not None:
+            observe(estimator, X, 0, out)
+        return out
+    rows = X.iloc if hasattr(X, "iloc") else X
+    out = None
+    for start in range(0, len(X), chunksize):
+        block = np.asarray(
+            estimator.predict(rows[start:start+chunksize], **estimator_kwargs)
+        )
+        if out is None:
+            out = np.empty((len(X),) + block.shape[1:], dtype=block.dtype)
+        out[start:start+len(block)] = block
+        if observe is not None:
+            observe(estimator, X, start, block)
+    return out
+
+def _predict_pair(pair, chunksize:int=None, estimator_kwargs:dict={}, observe=None):
+    """_predict on an (estimator, X) pair, for maps over several estimators"""
+    estimator, X = pair
+    return _predict(estimator, X, chunksize, estimator_kwargs, observe)
+
+def _in_process(executor=None) -> bool:
+    """whether the workers of executor share this process' memory"""
+    return executor in (None, "thread") or isinstance(executor, ThreadPoolExecutor)
+
+def _figure(**kwargs):
     """
-    Build a wide table of true and predicted values, stacked by
-    multi-targets
+    a new matplotlib Figure, made by pyplot, or standalone on its own
+    Agg canvas after spyglass.use_pyplot(False)
+    """
+    from ._fig_library import _uses_pyplot
+    if _uses_pyplot():
+        import matplotlib.pyplot as plt
+        return plt.figure(**kwargs)
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(**kwargs)
+    FigureCanvasAgg(figure)
+    return figure
+
+@contextmanager
+def _pool(executor=None, n_jobs:int=None):
+    """
+    Provide an ordered map over a worker pool.
+
+    executor may be an Executor instance, which is used as is, or one
+    of "thread" and "process" to start a pool of n_jobs workers for
+    the duration of the context. n_jobs=-1 uses every core. Without
+    either, work is done serially on the calling thread.
+    """
+    if isinstance(executor, Executor):
+        yield executor.map
+        return
+    if executor is None and n_jobs in (None, 1):
+        yield map
+        return
+    pools = {None: ThreadPoolExecutor,
+             "thread": ThreadPoolExecutor,
+             "process": ProcessPoolExecutor}
+    if executor not in pools:
+        raise ValueError(f"unknown executor '{executor}', choose from 'thread', 'process'")
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count()
+    with pools[executor](max_workers=n_jobs) as pool:
+        yield pool.map
+
+def _build_frame(y_preds, y_trues, partitions, models:list=None) -> pd.DataFrame:
     """
-    prednames = [str(name)+"_pred" for name in y_true.columns]
-    pred_label = ["pred"]*len(prednames)
-    true_label = ["true"]*len(prednames)
-    mc_ypred = pd.MultiIndex.from_arrays([prednames, pred_label],
-                                         names=["comparison", "xy"])
-    mc_ytrue = pd.MultiIndex.from_arrays([prednames, true_label],
-                                         names=["comparison", "xy"])
+    Build a long table of true and predicted values for every target
+    of every partition.
 
-    y_pred = pd.DataFrame(y_pred,
-                          columns=mc_ypred, index=y_true.index)
-    y_true = pd.DataFrame(y_true.values,
-                          columns=mc_ytrue, index=y_true.index)
-    data = pd.concat([y_true, y_pred], axis=1).stack("comparison")
+    args are equal length sequences of:
+    - y_preds :: prediction arrays, (rows,) or (rows, targets)
+    - y_trues :: frames of targets sharing the same columns: pandas,
+      Polars, Arrow or NumPy (structured arrays give their names)
+    - partitions :: partition names
+
+    When models names several estimators, each of y_preds is a
+    sequence of their predictions in the same order, and every model
+    gets a column of predictions next to a single true column in
+    place of pred.
+
+    Values are written straight into preallocated columns, each
+    partition's rows in order with their targets interleaved, so the
+    inputs are copied exactly once, from views of each target column
+    where the frame library allows. comparison and partition are
+    categoricals in order of first appearance.
+    """
+    if models is None:
+        models, y_preds = ["pred"], [[y_pred] for y_pred in y_preds]
+    columns = _columns(y_trues[0])
+    k = len(columns)
+    for y_true in y_trues:
+        if _columns(y_true) != columns:
+            raise ValueError("all partitions must have the same targets")
+    trues = [_column_arrays(y_true) for y_true in y_trues]
+    n = k * sum(len(true[0]) for true in trues)
+    dtype = np.result_type(*[np.asarray(y).dtype for preds in y_preds for y in preds],
+                           *[a.dtype for a in trues[0]])
+    pnames = list(dict.fromkeys(partitions))
+
+    values = np.empty((1 + len(models), n), dtype=dtype) #true, preds
+    comparison = np.empty(n, dtype=np.min_scalar_type(max(k-1, 0)))
+    partition = np.empty(n, dtype=np.min_scalar_type(max(len(pnames)-1, 0)))
+    start = 0
+    for preds, true, name in zip(y_preds, trues, partitions):
+        stop = start + k * len(true[0])
+        for j, column in enumerate(true):
+            values[0, start+j:stop:k] = column
+        for m, y_pred in enumerate(preds, 1):
+            values[m, start:stop].reshape(-1, k)[:] = np.reshape(y_pred, (-1, k))
+        comparison[start:stop].reshape(-1, k)[:] = np.arange(k)
+        partition[start:stop] = pnames.index(name)
+        start = stop
+
+    indexes = [_index(y_true) for y_true in y_trues]
+    index = indexes[0].append(indexes[1:]).repeat(k)
+    data = pd.DataFrame(values.T, index=index, copy=False,
+                        columns=pd.Index(["true", *models], name="xy"))
+    prednames = [str(name)+"_pred" for name in columns]
+    data.insert(0, "comparison",
+                pd.Categorical.from_codes(comparison, categories=prednames))
+    data["partition"] = pd.Categorical.from_codes(partition, categories=pnames)
     return data
 
+def _dominant(loadings:np.ndarray, top_k:int=None, threshold:float=None) -> np.ndarray:
+    """
+    mask of the loadings worth labelling on a plane: the top_k
+    longest and/or those at least threshold long. All by default.
+    """
+    length = np.hypot(loadings[:, 0], loadings[:, 1])
+    keep = np.ones(len(length), dtype=bool)
+    if threshold is not None:
+        keep &= length >= threshold
+    if top_k is not None and top_k < len(length):
+        top = np.zeros_like(keep)
+        top[np.argpartition(-length, top_k)[:top_k]] = True
+        keep &= top
+    return keep
+
+def _density(data:pd.DataFrame, x, y, by=(), bins:int=100, extent=None):
+    """
+    Aggregate the x and y columns of data into a bins x bins grid for
+    every group of the by columns in one vectorized pass.
+
+    Only occupied cells are returned, so the result has at most
+    bins**2 rows per group regardless of the length of data.
+
+    returns the binned frame (bin centers, count, group columns) and
+    the ((xmin, xmax), (ymin, ymax)) extent of the grid
+    """
+    xv = data[x].to_numpy(dtype=float)
+    yv = data[y].to_numpy(dtype=float)
+    keep = np.isfinite(xv) & np.isfinite(yv)
+    codes = np.zeros(len(data), dtype=np.intp)
+    levels = []
+    for col in by:
+        c, u = pd.factorize(data[col])
+        keep &= c >= 0
+        codes = codes * len(u) + c
+        levels.append(u)
+    ngroups = int(np.prod([len(u) for u in levels]))
+    if extent is None:
+        extent = ((xv[keep].min(), xv[keep].max()),
+                  (yv[keep].min(), yv[keep].max()))
+    extent = _span(extent)
+    flat = codes[keep] * bins**2 + _cells(xv[keep], yv[keep], extent, bins)
+    if ngroups * bins**2 <= 4 * flat.size:
+        counts = np.bincount(flat, minlength=ngroups * bins**2)
+        cells = np.flatnonzero(counts)
+        counts = counts[cells]
+    else: #sparse grid, don't allocate every empty cell
+        cells, counts = np.unique(flat, return_counts=True)
+    g, cells = np.divmod(cells, bins**2)
+
+    binned = _centers(cells, x, y, extent, bins)
+    binned['count'] = counts
+    for col, u in zip(reversed(by), reversed(levels)):
+        g, k = np.divmod(g, len(u))
+        binned[col] = u.take(k)
+    return pd.DataFrame(binned), extent
+
+def _density_blocks(blocks, x:int, y:int, bins:int, extent):
+    """
+    _density of columns x and y of a sequence of 2D array blocks
+    within a known extent. Counts are accumulated block by block so
+    memory is bounded by the block and grid sizes.
+    """
+    extent = _span(extent)
+    counts = np.zeros(bins**2, dtype=np.int64)
+    for block in blocks:
+        xv = np.asarray(block[:, x], dtype=float)
+        yv = np.asarray(block[:, y], dtype=float)
+        keep = np.isfinite(xv) & np.isfinite(yv)
+        counts += np.bincount(_cells(xv[keep], yv[keep], extent, bins),
+                              minlength=bins**2)
+    cells = np.flatnonzero(counts)
+    binned = _centers(cells, x, y, extent, bins)
+    binned['count'] = counts[cells]
+    return pd.DataFrame(binned), extent
+
+def _span(extent):
+    """widen degenerate ranges so a grid can be laid over them"""
+    return tuple((lo - .5, hi + .5) if lo == hi else (lo, hi)
+                 for lo, hi in extent)
+
+def _cells(xv:np.ndarray, yv:np.ndarray, extent, bins:int) -> np.ndarray:
+    """flat index of the bins x bins grid cell holding each point"""
+    (x0, x1), (y0, y1) = extent
+    ix = np.clip(((xv - x0) * (bins / (x1 - x0))).astype(np.intp), 0, bins-1)
+    iy = np.clip(((yv - y0) * (bins / (y1 - y0))).astype(np.intp), 0, bins-1)
+    return ix * bins + iy
+
+def _centers(cells:np.ndarray, x, y, extent, bins:int) -> dict:
+    """coordinates of the centers of flat grid cells"""
+    (x0, x1), (y0, y1) = extent
+    i, j = np.divmod(cells, bins)
+    return {x: x0 + (i + .5) * ((x1 - x0) / bins),
+            y: y0 + (j + .5) * ((y1 - y0) / bins)}
+
+class _GridIndex():
+    """
+    Uniform grid over 2D points, answering which points lie near a
+    location by looking only at the cells around it, so query time
+    does not grow with the number of points.
+
+    points are sorted by cell once; starts[c]:starts[c+1] slices the
+    points of cell c out of order.
+    """
+    def __init__(self, x, y, per_cell:int=4):
+        self.xy = np.column_stack([x, y]).astype(float)
+        finite = np.flatnonzero(np.isfinite(self.xy).all(axis=1))
+        n = max(len(finite), 1)
+        self.lo = np.nanmin(self.xy[finite], axis=0) if len(finite) else np.zeros(2)
+        span = np.nanmax(self.xy[finite], axis=0) - self.lo if len(finite) else np.ones(2)
+        span[span == 0] = 1
+        self.shape = max(1, int(np.sqrt(n / per_cell)))
+        self.size = span / self.shape
+        cells = self._cells(self.xy[finite])
+        order = np.argsort(cells, kind="stable")
+        self.order = finite[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.shape**2 + 1))
+
+    def _cells(self, xy):
+        c = np.clip(((xy - self.lo) / self.size).astype(np.intp), 0, self.shape - 1)
+        return c[:, 0] * self.shape + c[:, 1]
+
+    def query(self, x:float, y:float, rx:float, ry:float) -> np.ndarray:
+        """
+        indices of the points inside the ellipse of radii rx, ry about
+        x, y, nearest first
+        """
+        (cx0, cy0), (cx1, cy1) = np.clip(
+            ((np.array([[x - rx, y - ry], [x + rx, y + ry]]) - self.lo)
+             / self.size).astype(np.intp), 0, self.shape - 1
+        )
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.shape**2 // 4:
+            candidates = self.order #most of the grid, scan it all
+        else:
+            first = np.arange(cx0, cx1 + 1) * self.shape + cy0
+            candidates = np.concatenate([
+                self.order[self.starts[c]:self.starts[c + cy1 - cy0 + 1]]
+                for c in first
+            ])
+        d = (((self.xy[candidates, 0] - x) / rx)**2
+             + ((self.xy[candidates, 1] - y) / ry)**2)
+        near = d <= 1
+        return candidates[near][np.argsort(d[near], kind="stable")]
+
+def _label_array(labels) -> np.ndarray:
+    """
+    one label string per point, multiple label columns are joined
+    with newlines
+    """
+    if isinstance(labels, pd.DataFrame):
+        columns = [labels[c].astype(str) for c in labels.columns]
+        labels = columns[0].str.cat(columns[1:], sep="\n") if columns[1:] else columns[0]
+    if isinstance(labels, (pd.Series, pd.Index)):
+        return labels.astype(str).to_numpy()
+    return np.asarray(labels, dtype=object)
+
+def _block_reduce(a:np.ndarray, fy:int, fx:int) -> np.ndarray:
+    """
+    mean of each fy x fx block of a 2D array, ignoring non-finite
+    values. Edge blocks are padded, blocks without values are NaN.
+    """
+    ny, nx = -(-a.shape[0] // fy), -(-a.shape[1] // fx)
+    padded = np.full((ny * fy, nx * fx), np.nan)
+    padded[:a.shape[0], :a.shape[1]] = a
+    valid = np.isfinite(padded)
+    total = np.where(valid, padded, 0).reshape(ny, fy, nx, fx).sum(axis=(1, 3))
+    count = valid.reshape(ny, fy, nx, fx).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+def _format_cells(data:np.ndarray, valfmt, minus:str="-") -> np.ndarray:
+    """
+    format every value of data in one pass. Simple "{x:.2f}" style
+    strings are translated to printf style and applied by numpy,
+    anything else, including matplotlib Formatters, value by value.
+    hyphens in formatted strings are replaced by minus.
+    """
+    if not isinstance(valfmt, str):
+        return np.frompyfunc(lambda v: valfmt(v, None), 1, 1)(data).astype(str)
+    match = re.fullmatch(r"(.*)\{x:([-+ #0]?\d*(?:\.\d+)?[dfeEgG])\}(.*)", valfmt, re.S)
+    if match and "%" not in valfmt:
+        prefix, spec, suffix = match.groups()
+        text = np.char.mod(prefix + "%" + spec + suffix, data)
+    else:
+        text = np.frompyfunc(lambda v: valfmt.format(x=v), 1, 1)(data).astype(str)
+    return np.char.replace(text, "-", minus) if minus != "-" else text
+
 ## old guff
 def get_cmap(n, name='hsv'):
     """
@@ -65,7 +375,12 @@ def pickle_paste(fig):
     the raw data is loaded so to preserve it's heirarchy
     this is used to redisplay the figure
     should work for any kind of figure
+
+    deprecated: make figures with spec=True and render the
+    spyglass.FigureSpec again instead
     """
+    warnings.warn("pickle_paste is deprecated, render a spyglass.FigureSpec again instead",
+                  DeprecationWarning, stacklevel=2)
     if not fig:
         fig = plt.gcf()
     buf = io.BytesIO()
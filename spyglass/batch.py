@@ -0,0 +1,229 @@
+"""
+batch rendering of many figures from a job manifest
+
+A manifest is a JSON file (or an equivalent dict) listing jobs:
+
+{"defaults": {"backend": "plotly"},
+ "jobs": [
+   {"kind": "parity", "estimator": "model.pkl",
+    "partitions": [{"X": "X_train.parquet", "y": "y_train.parquet", "name": "train"},
+                   {"X": "X_test.parquet", "y": "y_test.parquet", "name": "test"}],
+    "kwargs": {"color": "partition"},
+    "output": "figures/parity.html"},
+   {"kind": "biplot", "estimator": "pca.pkl", "data": "X_train.parquet",
+    "kwargs": {"x": 0, "y": 1},
+    "output": "figures/biplot.png"}]}
+
+- kind :: "parity" or "biplot"
+- estimator :: a pickled (.pkl, .pickle) or joblib (.joblib) fitted estimator
+- partitions / data :: .parquet, .feather, .csv (first column is the
+  index), .npy or pickled pandas (.pkl) data files
+- backend :: "plotly" or "seaborn", as in spyglass.set_backend, the
+  backend in use when render is called by default
+- kwargs :: passed to parityplot or biplot
+- output :: figure path, its extension picks the format. plotly
+  writes .html and .json natively, images need kaleido.
+- export :: options of the written file, as in FigureSpec.export,
+  e.g. {"precision": "float32", "shared_data": true} for compact
+  plotly html
+
+Entries of "defaults" apply to every job that does not set them.
+Relative paths are relative to the manifest file.
+"""
+import pandas as pd
+import numpy as np
+
+import json
+import os
+import pickle
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import current_process
+
+from ._utils import _pool
+from ._fig_library import get_backend, _uses_pyplot, _load
+
+_locks = {} #data path -> lock, so threads read each file once
+
+def _read_manifest(manifest):
+    """jobs of a manifest path or dict, with defaults, backend and paths resolved"""
+    root = "."
+    if isinstance(manifest, (str, os.PathLike)):
+        root = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            manifest = json.load(f)
+    #workers never read the global backend, each job names its own
+    defaults = {"backend": get_backend(), **manifest.get("defaults", {})}
+    resolve = lambda path: os.path.normpath(os.path.join(root, path))
+    jobs = []
+    for i, job in enumerate(manifest["jobs"]):
+        job = {**defaults, **job, "job": i}
+        job["invalid"] = _invalid(job)
+        if job["invalid"]:
+            job["partitions"] = []
+            jobs.append(job)
+            continue
+        job["estimator"] = resolve(job["estimator"])
+        job["output"] = resolve(job["output"])
+        if "data" in job:
+            job["data"] = resolve(job["data"])
+        job["partitions"] = [{**p, "X": resolve(p["X"]), "y": resolve(p["y"])}
+                             for p in job.get("partitions", [])]
+        jobs.append(job)
+    return jobs
+
+def _invalid(job) -> str:
+    """what a job is missing, None if it can be run"""
+    missing = [key for key in ("kind", "estimator", "output") if key not in job]
+    if job.get("kind") == "parity":
+        if not job.get("partitions"):
+            missing.append("partitions")
+        for i, p in enumerate(job.get("partitions", [])):
+            missing += [f"partitions[{i}].{key}" for key in ("X", "y", "name") if key not in p]
+    elif job.get("kind") == "biplot" and "data" not in job:
+        missing.append("data")
+    if missing:
+        return f"job {job['job']} is missing {', '.join(missing)}"
+    return None
+
+def _data_paths(job) -> tuple:
+    """every data file a job reads"""
+    paths = [job["data"]] if "data" in job else []
+    for p in job["partitions"]:
+        paths += [p["X"], p["y"]]
+    return tuple(sorted(paths))
+
+def _load_data(path:str):
+    """read a data file, once per worker process"""
+    with _locks.setdefault(path, threading.Lock()): #threads wait for the first read
+        return _read_data(path)
+
+@lru_cache(maxsize=16)
+def _read_data(path:str):
+    """a data file read by its extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext == ".feather":
+        return pd.read_feather(path)
+    if ext == ".csv":
+        return pd.read_csv(path, index_col=0)
+    if ext == ".npy":
+        return np.load(path, mmap_mode="r")
+    if ext in (".pkl", ".pickle"):
+        return pd.read_pickle(path)
+    raise ValueError(f"unsupported data file '{path}'")
+
+@lru_cache(maxsize=16)
+def _load_estimator(path:str):
+    """unpickle a fitted estimator, once per worker"""
+    if path.endswith(".joblib"):
+        import joblib
+        return joblib.load(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def _save(p, backend:str, output:str, options:dict={}):
+    """write a figure of backend to output"""
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    content = _load(backend)._export(p, os.path.splitext(output)[1][1:].lower(), **options)
+    with open(output, "wb") as f:
+        f.write(content)
+
+def _run_job(job) -> dict:
+    """render one job with its backend, timing each stage"""
+    from . import parityplot, biplot
+    record = {"job": job["job"], "output": job.get("output"), "kind": job.get("kind"),
+              "worker": os.getpid(), "error": None}
+    start = time.perf_counter()
+    try:
+        if job.get("invalid"):
+            raise ValueError(job["invalid"])
+        estimator = _load_estimator(job["estimator"])
+        if job["kind"] == "parity":
+            args = []
+            for p in job["partitions"]:
+                args += [_load_data(p["X"]), _load_data(p["y"]), p["name"]]
+        elif job["kind"] == "biplot":
+            args = [_load_data(job["data"])]
+        else:
+            raise ValueError(f"unknown kind '{job['kind']}', choose from 'parity', 'biplot'")
+        loaded = time.perf_counter()
+        if job["kind"] == "parity":
+            spec = parityplot(estimator, *args, spec=True, **job.get("kwargs", {}))[0]
+        else:
+            spec, _ = biplot(*args, estimator, spec=True, **job.get("kwargs", {}))
+        p = spec.render(job["backend"])
+        rendered = time.perf_counter()
+        _save(p, job["backend"], job["output"], job.get("export", {}))
+        saved = time.perf_counter()
+        record.update(load=loaded - start, render=rendered - loaded, save=saved - rendered)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["total"] = time.perf_counter() - start
+    return record
+
+def _run_batch(jobs) -> list:
+    """run jobs sharing data in one worker, headless in worker processes"""
+    if current_process().name != "MainProcess":
+        import matplotlib
+        matplotlib.use("Agg")
+    return [_run_job(job) for job in jobs]
+
+def _groups(jobs) -> list:
+    """jobs sharing any data file, directly or through other jobs"""
+    parent = {}
+    def find(path):
+        while parent.setdefault(path, path) != path:
+            path = parent[path]
+        return path
+    for job in jobs:
+        paths = _data_paths(job)
+        for path in paths[1:]:
+            parent[find(path)] = find(paths[0])
+    groups = {}
+    for job in jobs:
+        paths = _data_paths(job)
+        groups.setdefault(find(paths[0]) if paths else ("job", job["job"]), []).append(job)
+    return list(groups.values())
+
+def render(manifest, n_jobs:int=-1, executor="process") -> pd.DataFrame:
+    """
+    Render every job of a manifest (path or dict) to its output.
+
+    Jobs sharing data files are batched into one task so each file is
+    read once, the batches are spread over n_jobs workers (-1 for all
+    cores) of executor, "process" by default, see parityplot. Process
+    workers draw with the Agg backend. Thread workers share the files
+    read, so their batches are also split to keep every worker busy.
+    Seaborn jobs drawn through pyplot, which is not thread safe, are
+    then run one at a time in the calling thread, see use_pyplot.
+
+    Each job is drawn with its own backend, the global one is left
+    as it is.
+
+    A job missing a key, or failing, does not stop the others, its
+    error is reported.
+
+    returns the per-job timings (seconds) of loading, rendering and
+    saving as a DataFrame
+    """
+    jobs = _read_manifest(manifest)
+    workers = os.cpu_count() if n_jobs is None or n_jobs < 0 else n_jobs
+    shared = executor in (None, "thread") or isinstance(executor, ThreadPoolExecutor)
+    serial = []
+    if shared and _uses_pyplot():
+        serial = [job for job in jobs if job.get("backend") == "seaborn"]
+        jobs = [job for job in jobs if job.get("backend") != "seaborn"]
+    # split the largest batches until every thread has one
+    batches = sorted(_groups(jobs), key=len) if jobs else []
+    while shared and batches and len(batches) < workers and len(batches[-1]) > 1:
+        largest = batches.pop()
+        half = len(largest) // 2
+        batches = sorted(batches + [largest[:half], largest[half:]], key=len)
+    with _pool(executor, n_jobs) as pmap:
+        records = [r for batch in pmap(_run_batch, batches) for r in batch]
+    records += _run_batch(serial)
+    return pd.DataFrame(records).sort_values("job").set_index("job")
@@ -0,0 +1,23 @@
+""" command line interface: spyglass render manifest.json"""
+import argparse
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="spyglass")
+    commands = parser.add_subparsers(dest="command", required=True)
+    render = commands.add_parser("render", help="render every figure of a job manifest")
+    render.add_argument("manifest", help="JSON job manifest, see spyglass.batch")
+    render.add_argument("-j", "--jobs", type=int, default=-1,
+                        help="worker processes, -1 for all cores (default)")
+    render.add_argument("--report", help="also write the job timings to this CSV file")
+    args = parser.parse_args(argv)
+
+    from .batch import render
+    timings = render(args.manifest, n_jobs=args.jobs)
+    print(timings.to_string())
+    if args.report:
+        timings.to_csv(args.report)
+    return 1 if timings["error"].notna().any() else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
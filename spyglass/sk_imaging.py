@@ -1,16 +1,61 @@
 import pandas as pd
 import numpy as np
 import re
+import time
+import warnings
+from functools import partial
 
-from ._utils import _build_frame, _grouper
-from ._fig_library import _make_parity_fig, _make_biplot
+from ._utils import (_build_frame, _grouper, _density, _density_blocks,
+                     _dominant, _predict, _predict_pair, _pool, _in_process)
+from ._cache import _cached_map, _cached_product
+from ._stream import _is_stream, _iter_chunks, _transform_stream
+from ._sampling import _sample_parity, _sample_plane
+from ._frames import _kind, _as_input, _to_kind, _columns, _column_arrays, _index
+from ._metrics import _Metrics, _annotations
+from ._fig_library import get_backend, _uses_pyplot, _update_biplot, _make_parity_live, _update_parity
+from ._spec import FigureSpec
+from ._profile import _call, _stage
 
-def parityplot(estimator, *args, estimator_kwargs:dict={}, **kwargs):
+#above this many points mode="auto" draws a density heatmap
+DENSITY_THRESHOLD = 200_000
+
+#keywords of one marker per point, which a heatmap cannot draw
+_SCATTER_ONLY = {'hover_name', 'hover_data', 'custom_data', 'text', 'symbol',
+                 'symbol_map', 'symbol_sequence', 'style', 'markers', 'size',
+                 'sizes', 'size_max', 'error_x', 'error_y'}
+
+def _scatter_only(kwargs:dict) -> list:
+    """the kwargs only a scatter can draw: per point keywords and values per row"""
+    return [k for k, v in kwargs.items()
+            if k in _SCATTER_ONLY or isinstance(v, (pd.DataFrame, pd.Series, np.ndarray))]
+
+def _use_density(mode:str, npoints:int, kwargs:dict={}) -> bool:
+    if mode not in ("auto", "scatter", "density"):
+        raise ValueError(f"unknown mode '{mode}', choose from 'auto', 'scatter', 'density'")
+    if mode == "auto":
+        return npoints > DENSITY_THRESHOLD and not _scatter_only(kwargs)
+    return mode == "density"
+
+def _density_kwargs(kwargs:dict) -> dict:
+    """kwargs without those only a scatter can draw, warning of the ones dropped"""
+    dropped = _scatter_only(kwargs)
+    if dropped:
+        warnings.warn(f"density mode ignores {', '.join(dropped)}, "
+                      "pass mode='scatter' to draw them", UserWarning, stacklevel=3)
+    return {k: v for k, v in kwargs.items() if k not in dropped}
+
+def parityplot(estimator, *args, estimator_kwargs:dict={},
+               mode:str="auto", bins:int=100,
+               n_jobs:int=None, executor=None, chunksize:int=None,
+               cache=None, spec:bool=False,
+               max_points:int=None, outlier_quantile:float=.99,
+               facet_page_size:int=None, metrics=False, **kwargs):
     """
     Qualitatively evaluate a regression model using array of parity plots
 
     args:
-    1. the estimator to explore
+    1. the estimator to explore, or several to compare as a dict of
+       names to estimators or a list of (name, estimator) pairs
     2. *args holds arbitrarily many triplets of:
        - X :: a domain
        - Y :: a co-domain
@@ -19,40 +64,561 @@ def parityplot(estimator, *args, estimator_kwargs:dict={}, **kwargs):
 
     incomplete triplets are ignored
 
+    X and Y may be pandas, Polars or Arrow frames or NumPy arrays
+    (structured arrays name their targets). The targets are read
+    through views of their columns where possible and the data is
+    returned as the frame type of the first Y: Polars, Arrow, or
+    pandas for pandas and NumPy.
+
+    partitions are predicted concurrently when given:
+    - n_jobs :: number of workers, -1 for all cores
+    - executor :: "thread" (default), "process" or an existing
+      concurrent.futures.Executor
+    chunksize splits each X into blocks of that many rows which are
+    predicted one at a time and stitched back together in order.
+
+    cache memoizes predictions across calls, so restyling a figure
+    does not predict again. Pass True to use the shared
+    spyglass.prediction_cache or a spyglass.PredictionCache.
+
+    mode chooses how predictions are drawn:
+    - "scatter" one marker per prediction
+    - "density" predictions are counted into a bins x bins grid for
+      each comparison and partition and drawn as a heatmap
+    - "auto" density above DENSITY_THRESHOLD predictions, else scatter,
+      and scatter whenever a keyword only markers can draw is given:
+      hover_name, symbol, size, ... or a series or array per row.
+      Density mode ignores such keywords, with a warning.
+
+    max_points caps the points drawn in scatter mode. Predictions
+    beyond the outlier_quantile of absolute residuals, per
+    comparison and partition, are all drawn, the rest are sampled
+    evenly across comparisons, partitions and regions of the plot.
+    The returned data is complete.
+
     **kwargs are passed to underlying plot library API:
     - plotly if available
     - seaborn otherwise
+    hover_name, a column of the data or a series of labels, names
+    hovered points with either library, seaborn labels them with the
+    index of the targets by default.
+
+    With spec=True nothing is drawn, a spyglass.FigureSpec is returned
+    in place of the figure to render or export later.
+
+    facet_page_size splits the comparisons into pages of that many
+    facets, wrapped into a square-ish grid. An iterator of figures,
+    one per page, is returned in place of the figure (a list of
+    FigureSpecs with spec=True). Pages share axis limits and parity
+    line, computed once. They are drawn as they are iterated, or in
+    parallel by the n_jobs/executor workers with plotly, or seaborn
+    after spyglass.use_pyplot(False).
+
+    metrics=True accumulates MAE, RMSE, R² and max error per
+    partition and target from each block of predictions as it is
+    made (chunksize rows, or the whole partition), and returns them
+    as a third value, a table in the frame type of the data.
+    Predictions taken from the cache or made in worker processes are
+    accumulated once they are returned. metrics="annotate" also
+    writes them in each facet.
+
+    Several named estimators, e.g. candidate models or the folds of
+    a cross validation, are predicted together in one pool and drawn
+    into one figure, colored by model (or faceted by rows in density
+    mode, or as placed by passing 'model' to a keyword). The returned
+    data is then compact: one true column shared by a column of
+    predictions per model, in place of pred, and metrics gain a model
+    column. max_points caps the points of all models together.
 
     The data is also returned for further plotting or tabulation.
     """
-    index_items=[v for k,v in kwargs.items() if isinstance(v, (pd.DataFrame, pd.Series))]
-    ldata = []
-    for triplet in _grouper(args, 3):
-        if hasattr(estimator, "predict"):
-            y_pred = estimator.predict(triplet[0], **estimator_kwargs)
+    if metrics not in (False, True, "annotate"):
+        raise ValueError(f"unknown metrics '{metrics}', choose from False, True, 'annotate'")
+    index_items = _index_items(kwargs)
+    models = _named_estimators(estimator)
+    if models is None and not hasattr(estimator, "predict"):
         #elif hasattr(estimator, "decision_function"):
         #    y_pred = estimator.decision_function(X)
         #elif hasattr(estimator, "predict_proba"):
         #    y_pred = estimator.predict_proba(X)
+        raise AttributeError("'estimator' does not have predict method")
+    triplets = list(_grouper(args, 3))
+    names = ["pred"] if models is None else list(models)
+    with _call("parityplot"):
+        Xs = [_as_input(triplet[0]) for triplet in triplets]
+        rows = len(names) * sum(map(len, Xs))
+        observe = None
+        if metrics:
+            accumulator = _Metrics(_columns(triplets[0][1]))
+            trues = [_column_arrays(triplet[1]) for triplet in triplets]
+            estimators = [estimator] if models is None else list(models.values())
+            #blocks are told apart by identity, repeated inputs are added after
+            if (_in_process(executor) and len(set(map(id, Xs))) == len(Xs)
+                    and len(set(map(id, estimators))) == len(estimators)):
+                observe = accumulator.observer(
+                    {id(X): (triplet[2], t) for X, triplet, t in zip(Xs, triplets, trues)},
+                    None if models is None else {id(m): name for name, m in models.items()})
+        with _stage("predict", rows=rows), _pool(executor, n_jobs) as pmap:
+            y_preds = _predict_partitions(estimator, models, Xs, pmap, cache,
+                                          chunksize, estimator_kwargs, observe)
+        if metrics:
+            with _stage("metrics", rows=rows):
+                #predictions from the cache or worker processes were not observed
+                for X, preds, t, (_, _, name) in zip(Xs, y_preds, trues, triplets):
+                    if models is None:
+                        preds = {None: (estimator, preds)}
+                    else:
+                        preds = {model: (models[model], y_pred)
+                                 for model, y_pred in zip(models, preds)}
+                    for model, (e, y_pred) in preds.items():
+                        if (id(e), id(X)) not in accumulator.observed:
+                            accumulator.add(name, t, y_pred, model=model)
+                table = accumulator.table()
+            if metrics == "annotate":
+                kwargs['annotations'] = _annotations(table)
+        data, _ = _parity_frame(y_preds, triplets, index_items,
+                                None if models is None else names)
+
+        points = len(names) * len(data)
+        density = _use_density(mode, points, kwargs)
+        lims = None
+        if density or facet_page_size is not None:
+            #one pass for every page and facet
+            values = data[['true', *names]].to_numpy()
+            lims = (np.nanmin(values), np.nanmax(values))
+        if models is not None:
+            _place_models(kwargs)
+        if density:
+            with _stage("bin", rows=points):
+                #each model binned from its own column, no stacked copy of the data
+                binned = []
+                for name in names:
+                    counts, extent = _density(data, 'true', name,
+                                              by=('comparison', 'partition'),
+                                              bins=bins, extent=(lims, lims))
+                    binned.append(counts.rename(columns={name: 'pred'}))
+                drawn = pd.concat(binned, ignore_index=True)
+                if models is not None:
+                    drawn['model'] = pd.Categorical(
+                        np.repeat(names, [len(counts) for counts in binned]), categories=names)
+            kind, params = 'parity_density', dict(z='count', extent=extent, bins=bins)
+            kwargs = _density_kwargs(kwargs)
         else:
-            raise AttributeError("'estimator' does not have predict method")
-        ldata.append(
-            _build_frame(y_pred, triplet[1])
-            .reset_index(level='comparison')
-            .assign(partition=triplet[2])
-        )
-    data = pd.concat(ldata, axis=0)
+            drawn = data
+            if max_points is not None and points > max_points:
+                with _stage("sample", rows=points):
+                    keep = _sample_parity(data, max_points // len(names),
+                                          outlier_quantile, preds=names)
+                    drawn, kwargs = data.iloc[keep], _take(kwargs, keep)
+            if models is not None:
+                drawn, kwargs = _stack_models(drawn, kwargs, names)
+            kind, params = 'parity', {} if lims is None else dict(lims=_pad(lims))
+        returned = (_to_kind(data, _kind(triplets[0][1])),)
+        if metrics:
+            returned += (_to_kind(table, _kind(triplets[0][1])),)
+        if facet_page_size is not None:
+            kwargs.setdefault('facet_col_wrap', int(np.ceil(np.sqrt(facet_page_size))))
+            figures = [FigureSpec(kind, page, x='true', y='pred',
+                                  facet_col="comparison", **params, **page_kwargs)
+                       for page, page_kwargs in _pages(drawn, kwargs, facet_page_size)]
+            if spec:
+                return (figures, *returned)
+            return (_render_pages(figures, executor, n_jobs), *returned)
+        figure = FigureSpec(kind, drawn, x='true', y='pred',
+                            facet_col="comparison", **params, **kwargs)
+        if spec:
+            return (figure, *returned)
+        with _stage("figure", rows=len(figure.data)):
+            p = figure.render()
+    return (p, *returned)
 
+def _index_items(kwargs:dict) -> list:
+    """the frames and series among kwargs, whose index the data is aligned to"""
+    return [v for v in kwargs.values() if isinstance(v, (pd.DataFrame, pd.Series))]
+
+def _predict_partitions(estimator, models:dict, Xs:list, pmap, cache=None,
+                        chunksize:int=None, estimator_kwargs:dict={}, observe=None) -> list:
+    """
+    predictions of each X, or per X a list of predictions per model
+    when several estimators are named. observe is passed to _predict.
+    """
+    if models is None:
+        predict = partial(_predict, estimator, chunksize=chunksize,
+                          estimator_kwargs=estimator_kwargs, observe=observe)
+        return _cached_map(cache, pmap, predict, estimator, Xs,
+                           "predict", estimator_kwargs)
+    #every model on every partition in one pool, model-major
+    predict = partial(_predict_pair, chunksize=chunksize,
+                      estimator_kwargs=estimator_kwargs, observe=observe)
+    flat = _cached_product(cache, pmap, predict, list(models.values()),
+                           Xs, "predict", estimator_kwargs)
+    return [flat[i::len(Xs)] for i in range(len(Xs))]
+
+def _parity_frame(y_preds:list, triplets:list, index_items:list, models:list=None):
+    """
+    the long frame of a parity plot, aligned to the index of the
+    first of index_items if any. Also returns, for each row, its
+    position in the frame as built (-1 for rows the alignment added),
+    None without alignment.
+    """
+    with _stage("build_frame") as stage:
+        data = _build_frame(y_preds,
+                            [triplet[1] for triplet in triplets],
+                            [triplet[2] for triplet in triplets],
+                            models=models)
+        stage.rows = len(data)
+    positions = None
     if index_items:
         #raise alarm if multiple possible indexes are present
-        data = data.reindex(index=index_items[0].index)
+        with _stage("reindex", rows=len(index_items[0])):
+            index = index_items[0].index
+            positions = pd.Series(np.arange(len(data)), index=data.index).reindex(index)
+            positions = positions.fillna(-1).to_numpy().astype(np.intp)
+            data = data.reindex(index=index)
+    return data, positions
 
-    p = _make_parity_fig(data,
-                         x='true', y='pred',
-                         facet_col="comparison", **kwargs)
-    return p, data
+def _take(kwargs:dict, rows:np.ndarray) -> dict:
+    """kwargs with the frames, series and arrays among them cut to rows"""
+    return {k: v.iloc[rows] if isinstance(v, (pd.DataFrame, pd.Series))
+            else v[rows] if isinstance(v, np.ndarray) and v.ndim else v
+            for k, v in kwargs.items()}
 
-def biplot(data, pcaxis, **kwargs):
+def _named_estimators(estimator) -> dict:
+    """
+    names to estimators when several are given as a dict or a list of
+    (name, estimator) pairs, None for a single estimator
+    """
+    if hasattr(estimator, "predict"):
+        return None
+    if isinstance(estimator, dict):
+        models = dict(estimator)
+    elif isinstance(estimator, (list, tuple)):
+        models = dict(estimator)
+        if len(models) != len(estimator):
+            raise ValueError("estimator names must be unique")
+    else:
+        return None
+    if not models:
+        raise ValueError("no estimators to compare")
+    for name, model in models.items():
+        if name in ("true", "pred", "comparison", "partition", "model"):
+            raise ValueError(f"'{name}' is reserved, it cannot name an estimator")
+        if not hasattr(model, "predict"):
+            raise AttributeError(f"estimator '{name}' does not have predict method")
+    return models
+
+def _place_models(kwargs:dict):
+    """color by model, or facet rows by it if color is taken, unless placed already"""
+    if "model" in [v for v in kwargs.values() if isinstance(v, str)]:
+        return
+    if "color" in kwargs:
+        kwargs.setdefault("facet_row", "model")
+    else:
+        kwargs["color"] = "model"
+
+def _stack_models(data:pd.DataFrame, kwargs:dict, names:list):
+    """
+    long form of the drawn rows of a compact frame: its rows repeated
+    per model with their predictions in pred and a model categorical,
+    and the frames among kwargs repeated alike
+    """
+    rows = np.tile(np.arange(len(data)), len(names))
+    long = data[['comparison', 'true', 'partition']].iloc[rows]
+    long.insert(2, 'pred', data[names].to_numpy().T.ravel())
+    long['model'] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(names)), len(data)), categories=names)
+    return long, _take(kwargs, rows)
+
+def _pad(lims:tuple, fraction:float=.02) -> tuple:
+    pad = fraction * (lims[1] - lims[0])
+    return lims[0] - pad, lims[1] + pad
+
+def _pages(data:pd.DataFrame, kwargs:dict, size:int):
+    """
+    split data, and the frames among kwargs, into pages of size
+    comparisons. Rows are grouped by page in one stable sort.
+    """
+    page = data['comparison'].cat.codes.to_numpy() // size
+    order = np.argsort(page, kind='stable')
+    bounds = np.searchsorted(page[order], np.arange(page.max() + 2))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        rows = order[lo:hi]
+        subset = data.iloc[rows]
+        subset = subset.assign(comparison=subset['comparison'].cat.remove_unused_categories())
+        yield subset, _take(kwargs, rows)
+
+def _render_pages(figures:list, executor=None, n_jobs:int=None):
+    """
+    render page specs in order, lazily or, given workers, in parallel.
+    seaborn pages made through pyplot are drawn one at a time, pyplot
+    is not thread safe, standalone figures are drawn in parallel.
+    """
+    if get_backend() == 'seaborn' and _uses_pyplot():
+        executor = n_jobs = None
+    with _pool(executor, n_jobs) as pmap:
+        yield from pmap(FigureSpec.render, figures)
+
+class LiveParity():
+    """
+    Parity plot kept alive while an estimator trains, e.g. between
+    partial_fit calls or epochs.
+
+    Takes the arguments of parityplot, drawn in scatter mode, for one
+    estimator. The frame is built as parityplot builds it, then it
+    and the figure are kept: update() predicts again and only swaps
+    the predictions of the figure in place: FigureWidget batch
+    updates with plotly, set_offsets and blitting with seaborn.
+    cache is as in parityplot, an estimator trained since is
+    predicted again.
+
+    updates are throttled to fps, update() does nothing until 1/fps
+    seconds have passed since the last drawn update.
+
+    the figure is kept as figure, its data as data, with the latest
+    predictions. data stays a pandas frame whatever the frame type of
+    the targets, it is updated in place.
+    """
+    def __init__(self, estimator, *args, estimator_kwargs:dict={}, fps:float=10,
+                 n_jobs:int=None, executor=None, chunksize:int=None, cache=None,
+                 **kwargs):
+        if not hasattr(estimator, "predict"):
+            raise AttributeError("'estimator' does not have predict method")
+        self.estimator = estimator
+        self.fps = fps
+        triplets = list(_grouper(args, 3))
+        self.Xs = [_as_input(triplet[0]) for triplet in triplets]
+        self.predict = partial(_predict_partitions, estimator, None, self.Xs, cache=cache,
+                               chunksize=chunksize, estimator_kwargs=estimator_kwargs)
+        self.n_jobs = n_jobs
+        self.executor = executor
+        with _call("LiveParity"):
+            with _stage("predict", rows=sum(map(len, self.Xs))), \
+                 _pool(executor, n_jobs) as pmap:
+                y_preds = self.predict(pmap)
+            self.data, self._positions = _parity_frame(y_preds, triplets, _index_items(kwargs))
+            with _stage("figure", rows=len(self.data)):
+                self.figure, self._artists = _make_parity_live(
+                    self.data.reset_index(drop=True).assign(_row=np.arange(len(self.data))),
+                    x='true', y='pred', facet_col="comparison", **kwargs
+                )
+        self._updated = time.perf_counter()
+
+    def update(self, force:bool=False) -> bool:
+        """
+        predict with the estimator as it is now and redraw, unless
+        throttled. force draws regardless of fps.
+
+        returns whether the figure was updated
+        """
+        if not force and time.perf_counter() - self._updated < 1 / self.fps:
+            return False
+        with _call("LiveParity.update"):
+            with _stage("predict", rows=sum(map(len, self.Xs))), \
+                 _pool(self.executor, self.n_jobs) as pmap:
+                #same row order as _build_frame, targets interleaved
+                pred = np.concatenate([np.ravel(y) for y in self.predict(pmap)])
+            if self._positions is not None: #rows as aligned by _parity_frame
+                pred = np.where(self._positions >= 0, pred[self._positions], np.nan)
+            self.data['pred'] = pred
+            xy = self.data[['true', 'pred']].to_numpy()
+            with _stage("update", rows=len(xy)):
+                _update_parity(self.figure, self._artists, xy,
+                               (np.nanmin(xy), np.nanmax(xy)))
+        self._updated = time.perf_counter()
+        return True
+
+def _component(c) -> int:
+    """index of a principal component given by number or name, e.g. 'pca3'"""
+    if isinstance(c, str):
+        return int(re.search(r'[0-9]+', c)[0])
+    return c
+
+class Biplot():
+    """
+    Reusable PCA biplot.
+
+    data is transformed and every loading is computed once, so any
+    pair of components can be drawn, or switched to on the figure
+    already drawn, without transforming again.
+
+    data, pcaxis, cache, chunksize, sample and out are as in biplot.
+
+    the full projection is kept as pcadata, the points drawn in
+    scatter mode as drawn (pcadata itself, or its sample when
+    streaming) and their positions in data as rows. Hovered points
+    are labelled by their index in data, or their position when
+    streaming, unless hover_name is given. Keywords given per row of
+    data, as arrays, series or frames, are cut to the points drawn.
+    """
+    def __init__(self, data, pcaxis, cache=None,
+                 chunksize:int=None, sample:int=100_000, out:str=None):
+        self.pcs = pcaxis.get_feature_names_out()
+        self.chunksize = chunksize
+        self.stream = _is_stream(data, chunksize)
+        with _call("Biplot"), _stage("transform") as stage:
+            if self.stream:
+                self.pcadata, self.lims, reservoir = _transform_stream(
+                    pcaxis.transform, _iter_chunks(data, chunksize), out=out, sample=sample
+                )
+                if sample is None: #every point, read from the memmap
+                    self.rows, self.drawn = np.arange(len(self.pcadata)), self.pcadata
+                else:
+                    self.rows, self.drawn = reservoir.sample()
+                self.index = None
+            else:
+                self.pcadata = _cached_map(cache, map, pcaxis.transform, pcaxis,
+                                           [_as_input(data)], "transform", {})[0]
+                self.drawn = self.pcadata
+                self.rows = np.arange(len(self.pcadata))
+                self.index = None if _kind(data) != 'pandas' else _index(data)
+            stage.rows = len(self.pcadata)
+        try:
+            self.features = pcaxis.feature_names_in_
+        except AttributeError:
+            self.features = np.array([f'x{i}' for i in range(pcaxis.n_features_in_)])
+        #postmultiply with data to get pcadata
+        self.loadings = pcaxis.components_.T * np.sqrt(pcaxis.explained_variance_)
+        self.figure = None
+
+    def _binned(self, x:int, y:int, bins:int):
+        with _stage("bin", rows=len(self.pcadata)):
+            if self.stream:
+                return _density_blocks(_iter_chunks(self.pcadata, self.chunksize),
+                                       x, y, bins, (self.lims[x], self.lims[y]))
+            return _density(pd.DataFrame({x: self.pcadata[:, x],
+                                          y: self.pcadata[:, y]}),
+                            x, y, bins=bins)
+
+    def _sampled(self, x:int, y:int, max_points:int, outlier_quantile:float, kwargs:dict):
+        """
+        the points to draw, their hover labels and kwargs with the
+        frames, series and arrays among them cut to the points drawn
+        """
+        if max_points is None or len(self.drawn) <= max_points:
+            keep = slice(None)
+        else:
+            with _stage("sample", rows=len(self.drawn)):
+                keep = _sample_plane(self.drawn[:, (x,y)], max_points, outlier_quantile)
+        rows = self.rows[keep]
+        if len(rows) < len(self.pcadata): #labels given per row of data
+            kwargs = _take(kwargs, rows)
+        return (self.drawn[keep], rows if self.index is None else self.index[rows].to_numpy(),
+                kwargs)
+
+    def spec(self, x=0, y=1, mode:str="auto", bins:int=100,
+             top_k:int=None, threshold:float=None,
+             max_points:int=None, outlier_quantile:float=.99, **kwargs) -> FigureSpec:
+        """
+        the spyglass.FigureSpec of components x and y, by number or
+        name, with their loadings. mode, bins, top_k, threshold,
+        max_points and outlier_quantile are as in biplot, **kwargs go
+        to the plot library.
+        """
+        x, y = _component(x), _component(y)
+        kwargs.update(x=x, y=y)
+        labelled = _dominant(self.loadings[:, (x,y)], top_k, threshold)
+        with _call("Biplot.spec"):
+            if _use_density(mode, len(self.pcadata), kwargs):
+                kwargs = _density_kwargs(kwargs)
+                binned, extent = self._binned(x, y, bins)
+                return FigureSpec('biplot_density', binned,
+                                  features=self.features,
+                                  loadings=self.loadings[:, (x,y)],
+                                  labels=self.pcs[(x,y),],
+                                  labelled=labelled,
+                                  z='count', extent=extent, bins=bins,
+                                  **kwargs)
+            drawn, hover_name, kwargs = self._sampled(x, y, max_points,
+                                                      outlier_quantile, kwargs)
+            kwargs.setdefault('hover_name', hover_name)
+        return FigureSpec('biplot', drawn,
+                          features=self.features,
+                          loadings=self.loadings[:, (x,y)],
+                          labels=self.pcs[(x,y),],
+                          labelled=labelled,
+                          **kwargs)
+
+    def plot(self, x=0, y=1, mode:str="auto", bins:int=100,
+             top_k:int=None, threshold:float=None,
+             max_points:int=None, outlier_quantile:float=.99, **kwargs):
+        """
+        draw components x and y as in spec. The figure is kept as
+        self.figure.
+        """
+        with _call("Biplot.plot"):
+            figure = self.spec(x, y, mode=mode, bins=bins,
+                               top_k=top_k, threshold=threshold,
+                               max_points=max_points,
+                               outlier_quantile=outlier_quantile, **kwargs)
+            self.density = figure.kind == 'biplot_density'
+            self.bins = bins
+            self.top_k = top_k
+            self.threshold = threshold
+            self.max_points = max_points
+            self.outlier_quantile = outlier_quantile
+            self.kwargs = dict(kwargs, x=figure.params['x'], y=figure.params['y'])
+            with _stage("figure", rows=len(figure.data)):
+                self.figure = figure.render()
+        return self.figure
+
+    def select(self, x, y):
+        """
+        switch self.figure to components x and y. Only the point data,
+        loadings and axis titles of the figure are replaced.
+
+        figures grouping points by color/hue, symbol/style or size
+        are drawn again instead.
+        """
+        x, y = _component(x), _component(y)
+        if self.figure is None:
+            return self.plot(x, y)
+        if _GROUPINGS.intersection(self.kwargs):
+            kwargs = {k: v for k, v in self.kwargs.items() if k not in ('x', 'y')}
+            return self.plot(x, y, mode="density" if self.density else "scatter",
+                             bins=self.bins, top_k=self.top_k,
+                             threshold=self.threshold, max_points=self.max_points,
+                             outlier_quantile=self.outlier_quantile, **kwargs)
+        self.kwargs.update(x=x, y=y)
+        counts = extent = hover_name = None
+        with _call("Biplot.select"):
+            if self.density:
+                binned, extent = self._binned(x, y, self.bins)
+                xy = binned[[x, y]].to_numpy()
+                counts = binned['count'].to_numpy()
+            else:
+                drawn, hover_name, kwargs = self._sampled(x, y, self.max_points,
+                                                          self.outlier_quantile, self.kwargs)
+                xy = drawn[:, (x,y)]
+                hover_name = kwargs.get('hover_name', hover_name)
+            loadings = self.loadings[:, (x,y)]
+            with _stage("update", rows=len(xy)):
+                _update_biplot(self.figure, xy=xy,
+                               loadings=loadings,
+                               features=self.features,
+                               labels=self.pcs[(x,y),],
+                               labelled=_dominant(loadings, self.top_k, self.threshold),
+                               counts=counts, extent=extent, bins=self.bins,
+                               hover_name=hover_name)
+        return self.figure
+
+    def scatter_matrix(self, components=None, **kwargs):
+        """
+        draw every pair of components, all by default, in one grid.
+        In streaming mode the sample is drawn.
+        """
+        if components is None:
+            components = range(len(self.pcs))
+        components = [_component(c) for c in components]
+        data = pd.DataFrame(self.drawn[:, components],
+                            columns=self.pcs[components])
+        return FigureSpec('scatter_matrix', data, **kwargs).render()
+
+#keywords which split the points of a figure into several artists
+_GROUPINGS = {'color', 'hue', 'symbol', 'style', 'size'}
+
+def biplot(data, pcaxis, mode:str="auto", bins:int=100, cache=None,
+           chunksize:int=None, sample:int=100_000, out:str=None,
+           spec:bool=False, **kwargs):
     """
     Takes data for PCA transformation and a fitted PCA estimator.
 
@@ -63,28 +629,45 @@ def biplot(data, pcaxis, **kwargs):
     Handles transforming the data and plotting the resulting
     projection with indicated loadings.
 
+    mode is "scatter", "density" or "auto" as in parityplot. In
+    density mode the projection is counted into a bins x bins grid
+    and drawn as a heatmap beneath the loadings.
+
+    every loading vector is drawn, only the top_k longest and/or those
+    at least threshold long on the plane are labelled. All are
+    labelled by default.
+
+    max_points caps the points drawn in scatter mode. Points beyond
+    the outlier_quantile of Mahalanobis distance on the plane
+    are all drawn, the rest are sampled evenly across regions of the
+    plane. The returned pcadata is complete.
+
+    cache memoizes the transform across calls as in parityplot.
+
+    data may be a pandas, Polars or Arrow frame or a NumPy array,
+    Arrow tables are passed on as pandas frames sharing their buffers.
+
+    data too large for memory is transformed out-of-core, in blocks of
+    chunksize rows (2**16 by default), when data is a Parquet path, a
+    numpy.memmap or an iterator of blocks, or chunksize is given. Then:
+    - the projection is written block by block to a memmap at out
+      (a temporary file by default)
+    - scatter mode draws a uniform sample of at most sample points,
+      or every point with sample=None
+    - density mode bins the memmap block by block
+    - cache is not used
+
+    With spec=True nothing is drawn, a spyglass.FigureSpec is returned
+    in place of the figure as in parityplot.
+
+    To draw several component pairs of the same data use Biplot.
+
     the pcadata is also returned for further plotting if desired.
     """
-    pcs = pcaxis.get_feature_names_out()
-    x = kwargs.get('x', 0)
-    y = kwargs.get('y', 1)
-    if isinstance(x, str) or isinstance(y, str):
-        x = int(re.search(r'[0-9]+', str(x))[0])
-        y = int(re.search(r'[0-9]+', str(y))[0])
-        kwargs['x'] = x
-        kwargs['y'] = y
-    pcadata = pcaxis.transform(data)
-    try:
-        features = pcaxis.feature_names_in_
-    except AttributeError:
-        features = np.array([f'x{i}' for i in range(pcaxis.n_features_in_)])
-    loadings = pcaxis.components_.T * np.sqrt(pcaxis.explained_variance_)
-    #postmultiply with data to get pcadata
-    loadings = loadings[:, (x,y)]
-    labels = pcs[(x,y),]
-    p = _make_biplot(data=pcadata,
-                     features=features,
-                     loadings=loadings,
-                     labels=labels,
-                     **kwargs)
-    return p, pcadata
+    with _call("biplot"):
+        b = Biplot(data, pcaxis, cache=cache,
+                   chunksize=chunksize, sample=sample, out=out)
+        if spec:
+            return b.spec(mode=mode, bins=bins, **kwargs), b.pcadata
+        p = b.plot(mode=mode, bins=bins, **kwargs)
+    return p, b.pcadata
@@ -1,7 +1,15 @@
 import pandas as pd
 import numpy as np
 
-def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="", **kwargs):
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator, FuncFormatter
+
+from ._utils import _block_reduce, _format_cells, _figure
+from ._fig_library import _uses_pyplot
+
+def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="",
+            max_cells=512, max_ticks=50, **kwargs):
     """
     Create a heatmap from a numpy array and two lists of labels.
 
@@ -15,21 +23,70 @@ def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="", **k
     A list or array of length M with the labels for the columns.
     ax
     A `matplotlib.axes.Axes` instance to which the heatmap is plotted.  If
-    not provided, use current axes or create a new one.  Optional.
+    not provided, use current axes or create a new one, on a standalone
+    figure after `spyglass.use_pyplot(False)`.  Optional.
     cbar_kw
     A dictionary with arguments to `matplotlib.Figure.colorbar`.  Optional.
     cbarlabel
     The label for the colorbar.  Optional.
+    max_cells
+    Matrices with more rows or columns than this are shown block
+    averaged down to at most max_cells per side. The visible window is
+    resampled when zooming, reaching full resolution once it fits.
+    Optional.
+    max_ticks
+    Beyond this many rows or columns only a readable subset of ticks
+    is labelled and the cell grid is not drawn.  Optional.
     **kwargs
     All other arguments are forwarded to `imshow`.
     """
     if not ax:
-         ax = plt.gca()
+         ax = plt.gca() if _uses_pyplot() else _figure().subplots()
+    data = np.asarray(data)
+    nrows, ncols = data.shape
+    large = max(nrows, ncols) > max_cells
     # Plot the heatmap
-    im = ax.imshow(data, **kwargs)
+    if large:
+        kwargs.setdefault("interpolation", "nearest")
+        im = ax.imshow(data[:1, :1], **kwargs) #data is set by resample
+        if "norm" not in kwargs:
+            im.set_clim(kwargs.get("vmin", np.nanmin(data)),
+                        kwargs.get("vmax", np.nanmax(data)))
+        ax.set_xlim(-.5, ncols-.5)
+        ax.set_ylim(nrows-.5, -.5)
+        ax.set_autoscale_on(False)
+        def resample(ax):
+            """show the visible window block averaged to max_cells"""
+            (x0, x1), (y0, y1) = sorted(ax.get_xlim()), sorted(ax.get_ylim())
+            c0, c1 = max(int(np.floor(x0 + .5)), 0), min(int(np.ceil(x1 + .5)), ncols)
+            r0, r1 = max(int(np.floor(y0 + .5)), 0), min(int(np.ceil(y1 + .5)), nrows)
+            fy = -(-(r1 - r0) // max_cells) or 1
+            fx = -(-(c1 - c0) // max_cells) or 1
+            window = _block_reduce(data[r0:r1, c0:c1], fy, fx)
+            im.set_data(window)
+            im.set_extent((c0 - .5, c0 - .5 + window.shape[1] * fx,
+                           r0 - .5 + window.shape[0] * fy, r0 - .5))
+        resample(ax)
+        ax.callbacks.connect("xlim_changed", resample)
+        ax.callbacks.connect("ylim_changed", resample)
+    else:
+        im = ax.imshow(data, **kwargs)
     # Create colorbar with ticklabels proportional to figure size
     cbar = ax.figure.colorbar(im, ax=ax, **cbar_kw)
     cbar.ax.set_ylabel(cbarlabel, rotation=-90, va="bottom")
+    if max(nrows, ncols) > max_ticks:
+        # label a readable subset of ticks, chosen as the view changes
+        for axis, labels in ((ax.xaxis, col_labels), (ax.yaxis, row_labels)):
+            axis.set_major_locator(MaxNLocator(max_ticks, integer=True))
+            axis.set_major_formatter(FuncFormatter(
+                lambda v, pos, labels=labels:
+                str(labels[int(v)]) if 0 <= int(v) < len(labels) else ""
+            ))
+        ax.tick_params(top=True, bottom=False,
+                       labeltop=True, labelbottom=False)
+        ax.tick_params(axis="x", labelrotation=-30)
+        ax.spines['top'].set_visible(False)
+        return im, cbar
     # show all ticks
     ax.set_xticks(np.arange(data.shape[1]))
     ax.set_yticks(np.arange(data.shape[0]))
@@ -40,7 +97,7 @@ def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="", **k
     ax.tick_params(top=True, bottom=False,
                    labeltop=True, labelbottom=False)
     # Rotate tick labels and set their alignment.
-    plt.setp(ax.get_xticklabels(), rotation=-30, ha="right",
+    mpl.artist.setp(ax.get_xticklabels(), rotation=-30, ha="right",
              rotation_mode="anchor")
     # Turn spines off and create white grid.
     ax.spines['top'].set_visible(False)
@@ -52,7 +109,8 @@ def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="", **k
 
     return im, cbar
 
-def annotate_heatmap(im, data=None, valfmt="{x:.2f}", textcolors=("black", "white"), threshold=None, **textkw):
+def annotate_heatmap(im, data=None, valfmt="{x:.2f}", textcolors=("black", "white"),
+                     threshold=None, mask=None, skip_small=False, **textkw):
     """
     A function to annotate a heatmap.
 
@@ -73,31 +131,64 @@ def annotate_heatmap(im, data=None, valfmt="{x:.2f}", textcolors=("black", "whit
         Value in data units according to which the colors from textcolors are
         applied.  If None (the default) uses the middle of the colormap as
         separation.  Optional.
+    mask
+        Boolean array the shape of data, only True cells are annotated,
+        e.g. cells passing a significance test.  Optional.
+    skip_small
+        Annotate nothing if the text would not fit in the cells as
+        currently drawn, e.g. for large heatmaps.  Optional.
     ,**kwargs
         All other arguments are forwarded to each call to `text` used to create
         the text labels.
+
+    Colors and strings are computed for all cells at once, a `Text`
+    is only created for the cells annotated. Cells are placed using
+    the image extent, so block averaged heatmaps are annotated per
+    block.
     """
     if not isinstance(data, (list, np.ndarray)):
         data = im.get_array()
+    data = np.ma.getdata(data)
         # Normalize the threshold to the images color range.
     if threshold is not None:
         threshold = im.norm(threshold)
     else:
-        threshold = im.norm(data.max())/2.
+        threshold = im.norm(np.nanmax(data))/2.
         # Set default alignment to center, but allow it to be
         # overwritten by textkw.
     kw = dict(horizontalalignment="center",
               verticalalignment="center")
     kw.update(textkw)
+    nrows, ncols = data.shape
+    # Locate cell centers from the image extent
+    x0, x1, y0, y1 = im.get_extent()
+    if im.origin == "upper": # first row on top
+        y0, y1 = y1, y0
+    xs = x0 + (np.arange(ncols) + .5) * (x1 - x0) / ncols
+    ys = y0 + (np.arange(nrows) + .5) * (y1 - y0) / nrows
+    if mask is None:
+        mask = np.ones(data.shape, dtype=bool)
+    rows, cols = np.nonzero(mask & np.isfinite(data))
+    if skip_small:
+        # Compare a cell, as drawn, to the text size
+        size = mpl.font_manager.FontProperties(
+            size=kw.get("fontsize", kw.get("size"))).get_size_in_points()
+        font_px = size * im.axes.figure.dpi / 72
+        (ax0, ay0), (ax1, ay1) = im.axes.transData.transform([(x0, y0), (x1, y1)])
+        cell_w, cell_h = abs(ax1 - ax0) / ncols, abs(ay1 - ay0) / nrows
+        if cell_h < font_px:
+            return []
     # Get the formatter in case a string is supplied
-    if isinstance(valfmt, str):
-        valfmt = mpl.ticker.StrMethodFormatter(valfmt)
-        # Loop over the data and create a `Text` for each "pixel".
+    minus = "\N{MINUS SIGN}" if mpl.rcParams["axes.unicode_minus"] else "-"
+    strings = _format_cells(data[rows, cols], valfmt, minus)
+    if skip_small and len(strings) and cell_w < .6 * font_px * max(map(len, strings)):
+        return []
         # Change the text's color depending on the data.
+    above = np.asarray(im.norm(data[rows, cols])) > threshold
+    colors = np.asarray(textcolors)[above.astype(int)]
     texts = []
-    for i in range(data.shape[0]):
-        for j in range(data.shape[1]):
-            kw.update(color=textcolors[int(im.norm(data[i, j]) > threshold)])
-            text = im.axes.text(j, i, valfmt(data[i, j], None), **kw)
-            texts.append(text)
+    for i, j, string, color in zip(rows, cols, strings, colors):
+        kw.update(color=color)
+        text = im.axes.text(xs[j], ys[i], string, **kw)
+        texts.append(text)
     return texts
@@ -0,0 +1,23 @@
+"""shared setup of the tests: headless matplotlib and spyglass' global settings"""
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+
+import spyglass
+from spyglass._fig_library import _uses_pyplot
+
+@pytest.fixture(autouse=True)
+def spyglass_settings():
+    """restore the backend and pyplot use a test changes, even when it fails"""
+    backend, pyplot = spyglass.get_backend(), _uses_pyplot()
+    yield
+    spyglass.set_backend(backend)
+    spyglass.use_pyplot(pyplot)
+
+@pytest.fixture
+def plt():
+    """matplotlib.pyplot on the Agg backend, every figure closed after the test"""
+    import matplotlib.pyplot as plt
+    yield plt
+    plt.close("all")
@@ -2,6 +2,7 @@ from spyglass import __version__
 import spyglass
 import spyglass
 import numpy as np
+import pandas as pd
 
 def test_version():
     assert __version__ == '0.1.0'
@@ -18,3 +19,651 @@ def test_annotfig():
 
     assert True
     
+
+def test_lazy_backend():
+    import subprocess, sys
+    code = ("import sys, spyglass\n"
+            "assert 'plotly' not in sys.modules\n"
+            "assert 'seaborn' not in sys.modules\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+def test_set_backend():
+    spyglass.set_backend("seaborn")
+    assert spyglass.get_backend() == "seaborn"
+    spyglass.set_backend("plotly")
+    assert spyglass.get_backend() == "plotly"
+    try:
+        spyglass.set_backend("bokeh")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown backend accepted")
+
+class Doubler:
+    """fitted regressor stand-in"""
+    def predict(self, X):
+        return 2 * np.asarray(X)
+
+def test_density():
+    from spyglass._utils import _density
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"x": rng.normal(size=1000),
+                       "y": rng.normal(size=1000),
+                       "g": rng.choice(["a", "b"], size=1000)})
+    binned, extent = _density(df, "x", "y", by=("g",), bins=10)
+    assert len(binned) <= 2 * 10**2
+    assert binned["count"].sum() == 1000
+    counts = binned.groupby("g")["count"].sum()
+    assert (counts == df["g"].value_counts()).all()
+    (x0, x1), _ = extent
+    assert binned["x"].between(x0, x1).all()
+
+def test_parityplot_density():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame(np.random.random((50, 2)), columns=["a", "b"])
+    p, data = spyglass.parityplot(Doubler(), X, X, "train", mode="density", bins=5)
+    assert len(data) == 100
+    assert p.data[0].type == "histogram2d"
+
+def test_auto_density_scatter_kwargs(monkeypatch, plt):
+    import pytest
+    from spyglass import sk_imaging
+    monkeypatch.setattr(sk_imaging, "DENSITY_THRESHOLD", 20)
+    X = pd.DataFrame(np.random.random((40, 2)), columns=["a", "b"],
+                     index=[f"row{i}" for i in range(40)])
+    labels = pd.Series(X.index, index=X.index)
+    A = X[["a"]]
+    for backend in ("plotly", "seaborn"):
+        spyglass.set_backend(backend)
+        p, _ = spyglass.parityplot(Doubler(), A, A, "train", hover_name=labels)
+        if backend == "plotly":
+            assert p.data[0].type == "scatter"
+            p, _ = spyglass.parityplot(Doubler(), A, A, "train", symbol="partition")
+            assert p.data[0].type == "scatter"
+        p, _ = spyglass.parityplot(Doubler(), A, A, "train", color="partition")
+        if backend == "plotly":
+            assert p.data[0].type == "histogram2d"
+        with pytest.warns(UserWarning, match="hover_name"):
+            spyglass.parityplot(Doubler(), A, A, "train", mode="density", hover_name=labels)
+        p, _ = spyglass.biplot(X, Projector(2), hover_name=X.index.to_numpy())
+        if backend == "plotly":
+            assert p.data[0].type == "scatter"
+        with pytest.warns(UserWarning, match="hover_name"):
+            spyglass.biplot(X, Projector(2), mode="density", hover_name=X.index.to_numpy())
+
+def test_parityplot_chunked_parallel():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame(np.random.random((50, 2)), columns=["a", "b"])
+    args = (X[:30], X[:30], "train", X[30:], X[30:], "test")
+    _, serial = spyglass.parityplot(Doubler(), *args, mode="scatter")
+    for kw in (dict(chunksize=7), dict(n_jobs=2), dict(executor="process", chunksize=4)):
+        _, data = spyglass.parityplot(Doubler(), *args, mode="scatter", **kw)
+        pd.testing.assert_frame_equal(data, serial)
+
+def test_build_frame():
+    from spyglass._utils import _build_frame
+    y_true = pd.DataFrame(np.arange(6.).reshape(3, 2), columns=["a", "b"], index=[4, 5, 6])
+    data = _build_frame([y_true.values + 1, y_true.values[:1] + 1],
+                        [y_true, y_true[:1]], ["train", "test"])
+    assert list(data.columns) == ["comparison", "true", "pred", "partition"]
+    assert list(data.index) == [4, 4, 5, 5, 6, 6, 4, 4]
+    assert list(data["comparison"]) == ["a_pred", "b_pred"] * 4
+    assert list(data["partition"]) == ["train"] * 6 + ["test"] * 2
+    assert (data["pred"] - data["true"] == 1).all()
+    assert data.loc[6, "true"].tolist() == [4., 5.]
+
+class CountingDoubler(Doubler):
+    calls = 0
+    def predict(self, X):
+        CountingDoubler.calls += 1
+        return super().predict(X)
+
+def test_prediction_cache(tmp_path):
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame(np.random.random((20, 2)), columns=["a", "b"])
+    est = CountingDoubler()
+    cache = spyglass.PredictionCache(maxsize=4, directory=str(tmp_path))
+    _, first = spyglass.parityplot(est, X, X, "train", cache=cache, mode="scatter")
+    _, again = spyglass.parityplot(est, X, X, "train", cache=cache, mode="scatter")
+    assert CountingDoubler.calls == 1
+    pd.testing.assert_frame_equal(first, again)
+    #on-disk store survives a fresh in-memory cache
+    disk = spyglass.PredictionCache(directory=str(tmp_path))
+    spyglass.parityplot(est, X, X, "train", cache=disk, mode="scatter")
+    assert CountingDoubler.calls == 1
+    disk.invalidate(est)
+    assert not list(tmp_path.glob("*.npy"))
+    spyglass.parityplot(est, X + 1, X, "train", cache=disk, mode="scatter")
+    assert CountingDoubler.calls == 2
+
+class Projector:
+    """fitted PCA stand-in, components are the identity"""
+    def __init__(self, n):
+        self.n_features_in_ = n
+        self.components_ = np.eye(n)
+        self.explained_variance_ = np.ones(n)
+    def get_feature_names_out(self):
+        return np.array([f"pca{i}" for i in range(self.n_features_in_)])
+    def transform(self, X):
+        return np.asarray(X) @ self.components_.T
+
+def test_biplot_stream(tmp_path):
+    spyglass.set_backend("plotly")
+    X = np.random.random((1000, 3))
+    blocks = (X[i:i+64] for i in range(0, 1000, 64))
+    out = str(tmp_path / "pcs.dat")
+    p, pcadata = spyglass.biplot(blocks, Projector(3), mode="scatter", sample=100, out=out)
+    assert isinstance(pcadata, np.memmap)
+    assert np.allclose(pcadata, X)
+    assert len(p.data[0].x) == 100
+    p, pcadata = spyglass.biplot(X, Projector(3), mode="density", chunksize=100, bins=8)
+    assert p.data[0].type == "histogram2d"
+    assert sum(p.data[0].z) == 1000
+    p, pcadata = spyglass.biplot(X, Projector(3), mode="scatter", chunksize=100, sample=None)
+    assert len(p.data[0].x) == 1000
+    path = pcadata.filename
+    del p, pcadata
+    import gc, os
+    gc.collect()
+    assert not os.path.exists(path)
+    np.save(tmp_path/"X.npy", X)
+    mapped = np.load(tmp_path/"X.npy", mmap_mode="r")
+    b = spyglass.Biplot(mapped, Projector(3), sample=100)
+    assert b.stream and isinstance(b.pcadata, np.memmap) and len(b.drawn) == 100
+    import pytest
+    with pytest.raises(ValueError, match="sample"):
+        spyglass.biplot(mapped, Projector(3), sample=0)
+    with pytest.raises(ValueError, match="empty"):
+        spyglass.biplot(iter([X[:0]]), Projector(3))
+
+def test_biplot_select():
+    spyglass.set_backend("plotly")
+    X = np.random.random((200, 4))
+    pcaxis = Projector(4)
+    b = spyglass.Biplot(X, pcaxis)
+    pcaxis.transform = None #no further transforms allowed
+    p = b.plot(0, 1, mode="scatter")
+    assert b.select("pca2", 3) is p
+    assert np.allclose(p.data[0].x, X[:, 2])
+    assert np.allclose(p.data[0].y, X[:, 3])
+    assert p.layout.xaxis.title.text == "pca2"
+    m = b.scatter_matrix([0, 1, 2])
+    assert len(m.data[0].dimensions) == 3
+    names = pd.Series([f"row{i}" for i in range(200)])
+    for hover_name in (names, names.to_numpy()):
+        p = b.plot(0, 1, mode="scatter", max_points=50, hover_name=hover_name)
+        rows = [int(label[3:]) for label in p.data[0].hovertext]
+        assert len(rows) == len(p.data[0].x) and np.allclose(p.data[0].x, X[rows, 0])
+        b.select(2, 3)
+        rows = [int(label[3:]) for label in p.data[0].hovertext]
+        assert np.allclose(p.data[0].x, X[rows, 2])
+
+def test_biplot_batched_loadings():
+    spyglass.set_backend("plotly")
+    X = np.random.random((100, 300))
+    p, _ = spyglass.biplot(X, Projector(300), mode="scatter", top_k=5)
+    names = [trace.name for trace in p.data]
+    assert names.count("loadings") == 1
+    assert len(p.layout.shapes) == 0
+    labels = p.data[names.index("loading labels")]
+    assert len(labels.text) == 5
+
+def test_interaxes_click_index(plt):
+    from matplotlib.backend_bases import MouseEvent
+    import spyglass.EDA
+    xy = np.random.default_rng(0).random((5000, 2))
+    labels = ["Label for instance #{0}".format(i) for i in np.arange(xy.shape[0])]
+    fig, ax = plt.subplots(1, 1, FigureClass=spyglass.EDA.EDAFigure,
+                           subplot_kw={'projection': 'interactive'})
+    ax.activescatter(xy[:, 0], xy[:, 1], labels)
+    fig.canvas.draw()
+    px, py = ax.transData.transform(xy[42])
+    MouseEvent("button_press_event", fig.canvas, px, py, button=1)._process()
+    texts = [t.get_text() for t in ax.texts]
+    assert 0 < len(texts) <= ax.picklimit
+    assert texts[0] == labels[42]
+    plt.close(fig)
+
+def test_interaxes_clear_blit(plt):
+    from matplotlib.backend_bases import MouseEvent
+    import spyglass.EDA
+    xy = np.random.random((100, 2))
+    fig, ax = plt.subplots(1, 1, FigureClass=spyglass.EDA.EDAFigure,
+                           subplot_kw={'projection': 'interactive'})
+    fig.add_button()
+    ax.activescatter(xy[:, 0], xy[:, 1], [str(i) for i in range(100)])
+    fig.canvas.draw()
+    collections = list(ax.collections)
+    def replot():
+        raise AssertionError("data layer re-plotted")
+    ax.drawself = replot
+    px, py = ax.transData.transform(xy[7])
+    MouseEvent("button_press_event", fig.canvas, px, py, button=1)._process()
+    assert ax._annotations and all(a.get_animated() for a in ax._annotations)
+    ax.make_onclickclear()(None)
+    assert not ax._annotations and not ax.texts
+    assert list(ax.collections) == collections
+    plt.close(fig)
+
+def test_heatmap_annotate(plt):
+    from spyglass.spyglass import heatmap, annotate_heatmap
+    data = np.arange(12.).reshape(3, 4)
+    fig, ax = plt.subplots()
+    im, _ = heatmap(data, list("abc"), list("wxyz"), ax=ax)
+    texts = annotate_heatmap(im, valfmt="{x:.1f}", mask=data != 5)
+    assert len(texts) == 11
+    six = [t for t in texts if t.get_text() == "6.0"][0]
+    assert six.get_position() == (2, 1)
+    assert texts[0].get_color() == "black" and texts[-1].get_color() == "white"
+    plt.close(fig)
+
+def test_heatmap_large(plt):
+    from spyglass.spyglass import heatmap, annotate_heatmap
+    data = np.random.random((1000, 1000))
+    labels = [str(i) for i in range(1000)]
+    fig, ax = plt.subplots()
+    im, _ = heatmap(data, labels, labels, ax=ax, max_cells=100)
+    assert im.get_array().shape == (100, 100)
+    assert annotate_heatmap(im, skip_small=True) == []
+    ax.set_xlim(9.5, 19.5)
+    ax.set_ylim(19.5, 9.5)
+    assert np.allclose(im.get_array(), data[10:20, 10:20])
+    plt.close(fig)
+
+def test_render_manifest(tmp_path):
+    import pickle
+    pickle.dump(Doubler(), open(tmp_path/"model.pkl", "wb"))
+    X = pd.DataFrame({"a": np.arange(20.), "b": np.arange(20.)})
+    X.to_csv(tmp_path/"X.csv")
+    (2*X).to_csv(tmp_path/"y.csv")
+    part = {"X": "X.csv", "y": "y.csv", "name": "train"}
+    manifest = {"defaults": {"backend": "plotly", "estimator": "model.pkl"},
+                "jobs": [{"kind": "parity", "partitions": [part], "output": f"out/{i}.json"}
+                         for i in range(3)]
+                + [{"kind": "parity", "partitions": [{**part, "X": "missing.csv"}],
+                    "output": "out/bad.json"},
+                   {"kind": "parity", "partitions": [part]}]}
+    import json
+    (tmp_path/"manifest.json").write_text(json.dumps(manifest))
+    timings = spyglass.render(tmp_path/"manifest.json", n_jobs=2, executor="thread")
+    assert list(timings.output)[:4] == [str(tmp_path/f"out/{i}.json") for i in (0, 1, 2, "bad")]
+    assert timings.error.iloc[:3].isna().all()
+    assert "missing.csv" in timings.error.iloc[3]
+    assert "missing output" in timings.error.iloc[4]
+    from spyglass.batch import _read_manifest, _groups
+    jobs = _read_manifest({"jobs": [{"kind": "biplot", "estimator": "p", "data": d, "output": o}
+                                    for d, o in (("a", "1"), ("b", "2"))]
+                          + [{"kind": "parity", "estimator": "m", "output": "3",
+                              "partitions": [{"X": "a", "y": "b", "name": "all"}]}]})
+    assert len(_groups(jobs)) == 1
+    assert all((tmp_path/f"out/{i}.json").exists() for i in range(3))
+    from spyglass.cli import main
+    assert main(["render", str(tmp_path/"manifest.json"), "-j", "1"]) == 1
+    #backends mixed on threads, the global one left alone
+    spyglass.set_backend("plotly")
+    manifest = {"defaults": {"estimator": "model.pkl", "partitions": [part]},
+                "jobs": [{"kind": "parity", "output": f"mixed/{i}.png", "backend": "seaborn"}
+                         if i % 2 else {"kind": "parity", "output": f"mixed/{i}.json"}
+                         for i in range(8)]}
+    (tmp_path/"mixed.json").write_text(json.dumps(manifest))
+    timings = spyglass.render(tmp_path/"mixed.json", n_jobs=4, executor="thread")
+    assert timings.error.isna().all()
+    assert spyglass.get_backend() == "plotly"
+    assert all((tmp_path/f"mixed/{i}.{'png' if i % 2 else 'json'}").exists() for i in range(8))
+
+def test_figure_spec(tmp_path):
+    import pickle
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.arange(10.)})
+    spec, data = spyglass.parityplot(Doubler(), X, 2*X, "train", spec=True)
+    assert isinstance(spec, spyglass.FigureSpec) and spec.data is data
+    assert spec.key() == pickle.loads(pickle.dumps(spec)).key()
+    restyled, _ = spyglass.parityplot(Doubler(), X, 2*X, "train", spec=True, title="t")
+    assert restyled.key() != spec.key()
+    assert spec.render().layout.xaxis.title.text == "true"
+
+    cache = spyglass.FigureCache(tmp_path/"figures")
+    content = spec.export("json", cache=cache)
+    assert len(list((tmp_path/"figures").iterdir())) == 1
+    spec.render = None #a cache hit does not render
+    assert spec.export("json", cache=cache) == content
+    cache.clear()
+    assert not list((tmp_path/"figures").iterdir())
+
+def test_pickle_paste_deprecated(plt):
+    import pytest
+    from spyglass._utils import pickle_paste
+    fig = plt.figure()
+    with pytest.warns(DeprecationWarning):
+        plt.close(pickle_paste(fig))
+    plt.close(fig)
+
+def test_profile_stages():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.arange(10.)})
+    with spyglass.profile(memory=True) as prof:
+        spyglass.parityplot(Doubler(), X, 2*X, "train", mode="density", bins=5)
+        b = spyglass.Biplot(np.random.random((50, 3)), Projector(3))
+        b.plot(0, 1)
+        b.select(1, 2)
+    stages = prof.frame()
+    assert list(stages.function.unique()) == ["parityplot", "Biplot", "Biplot.plot", "Biplot.select"]
+    assert list(stages[stages.call == 0].stage) == ["predict", "build_frame", "bin", "figure"]
+    assert stages.rows.iloc[0] == 10 and (stages.peak_bytes >= 0).all()
+    records = []
+    spyglass.add_hook(records.append)
+    try:
+        spyglass.biplot(np.random.random((50, 3)), Projector(3))
+    finally:
+        spyglass.remove_hook(records.append)
+    assert len(records) == 1 and records[0]["function"] == "biplot"
+    assert [s["stage"] for s in records[0]["stages"]] == ["transform", "figure"]
+    spyglass.parityplot(Doubler(), X, 2*X, "train")
+    assert len(records) == 1
+    import threading, tracemalloc
+    other = threading.Thread(target=spyglass.parityplot, args=(Doubler(), X, 2*X, "train"))
+    reset_peak = tracemalloc.reset_peak
+    del tracemalloc.reset_peak #as before Python 3.9
+    try:
+        with spyglass.profile(memory=True) as prof:
+            other.start()
+            other.join()
+            spyglass.parityplot(Doubler(), X, 2*X, "train")
+    finally:
+        tracemalloc.reset_peak = reset_peak
+    assert len(prof.records) == 1 and (prof.frame().peak_bytes >= 0).all()
+
+class Scaler:
+    """estimator 'trained' by changing its factor"""
+    def __init__(self, factor:float=1.):
+        self.factor = factor
+
+    def predict(self, X):
+        return self.factor * np.asarray(X)
+
+def test_live_parity(plt):
+    X = pd.DataFrame({"a": np.arange(10.), "b": np.arange(10.)})
+    for backend in ("plotly", "seaborn"):
+        spyglass.set_backend(backend)
+        model = Scaler()
+        live = spyglass.LiveParity(model, X[:6], X[:6], "train", X[6:], X[6:], "test",
+                                   color="partition", fps=1e-3)
+        model.factor = 3.
+        assert not live.update()
+        assert live.update(force=True)
+        assert np.allclose(live.data.pred.to_numpy(), 3 * live.data.true.to_numpy())
+        if backend == "plotly":
+            points = [t for t in live.figure.data if t.name != "parity"]
+            assert sorted(np.concatenate([t.y for t in points])) == sorted(live.data.pred)
+            assert live.figure.data[-1].x == (0, 27)
+        else:
+            for points, rows in live._artists.artists:
+                assert np.allclose(points.get_offsets(), live.data[["true", "pred"]].to_numpy()[rows])
+                assert points.axes.get_ylim()[1] >= 27
+            plt.close(live.figure.figure)
+    spyglass.set_backend("plotly")
+    labels = pd.Series([f"row{i}" for i in range(8)], index=X.index[::-1][:8])
+    model = Scaler()
+    live = spyglass.LiveParity(model, X[["a"]], X[["a"]], "all", hover_name=labels, cache=True)
+    model.factor = 2.
+    live.update(force=True)
+    _, static = spyglass.parityplot(model, X[["a"]], X[["a"]], "all", hover_name=labels)
+    pd.testing.assert_frame_equal(live.data, static)
+
+def test_outlier_sampling():
+    spyglass.set_backend("plotly")
+    class Noisy:
+        def predict(self, X):
+            pred = np.asarray(X, dtype=float).copy()
+            pred[::100] += 1000 #outliers
+            return pred
+    X = pd.DataFrame({"a": np.random.random(10_000), "b": np.random.random(10_000)})
+    spec, data = spyglass.parityplot(Noisy(), X[:8000], X[:8000], "train",
+                                     X[8000:], X[8000:], "test",
+                                     mode="scatter", max_points=1000, spec=True)
+    assert len(data) == 20_000
+    drawn = spec.data
+    assert len(drawn) <= 1000
+    assert ((drawn.pred - drawn.true) > 500).sum() == 200 #every outlier drawn
+    assert set(drawn.groupby(["comparison", "partition"], observed=True).size().index) == \
+        {(c, p) for c in ("a_pred", "b_pred") for p in ("train", "test")}
+
+    xy = np.random.normal(size=(5000, 3))
+    xy[0] = 100
+    b = spyglass.Biplot(xy, Projector(3))
+    p = b.plot(0, 1, mode="scatter", max_points=500)
+    assert len(p.data[0].x) == 500 and p.data[0].x.max() == 100
+    b.select(1, 2)
+    assert len(p.data[0].x) == 500 and len(b.pcadata) == 5000
+    from spyglass._sampling import _caps
+    for counts in (np.full(256, 100), np.random.randint(0, 50, 256)):
+        caps = _caps(counts, 1000)
+        assert caps.sum() == min(1000, counts.sum()) and (caps <= counts).all()
+
+def test_frame_types():
+    import pytest
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.arange(10.), "b": np.arange(10.)})
+    expected = spyglass.parityplot(Doubler(), X, 2*X, "train", spec=True)[1]
+    structured = np.rec.fromarrays([2*X.a.to_numpy(), 2*X.b.to_numpy()], names="a,b")
+    _, data = spyglass.parityplot(Doubler(), X.to_numpy(), structured, "train", spec=True)
+    assert isinstance(data, pd.DataFrame)
+    assert data.reset_index(drop=True).equals(expected.reset_index(drop=True))
+    for module in ("polars", "pyarrow"):
+        pytest.importorskip(module)
+    import polars as pl
+    import pyarrow as pa
+    _, data = spyglass.parityplot(Doubler(), pl.from_pandas(X), pl.from_pandas(2*X), "train", spec=True)
+    assert isinstance(data, pl.DataFrame)
+    assert data["pred"].to_list() == expected["pred"].to_list()
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    _, data = spyglass.parityplot(Doubler(), table, pa.Table.from_pandas(2*X, preserve_index=False),
+                                  "train", spec=True)
+    assert isinstance(data, pa.Table)
+    assert data.column("comparison").to_pylist()[:2] == ["a_pred", "b_pred"]
+    seen, pcaxis = [], Projector(2)
+    pcaxis.transform = lambda block: seen.append(type(block)) or np.asarray(block)
+    reader = pa.RecordBatchReader.from_batches(table.schema, table.to_batches(max_chunksize=4))
+    _, pcadata = spyglass.biplot(reader, pcaxis, mode="scatter")
+    assert seen == [pd.DataFrame] * 3
+    assert np.allclose(pcadata, X)
+
+def test_facet_pages():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame(np.random.random((20, 5)) * np.arange(1, 6))
+    pages, data = spyglass.parityplot(Doubler(), X, X, "train", facet_page_size=2)
+    assert len(data) == 100
+    figures = list(pages)
+    assert len(figures) == 3
+    facets = [{t.xaxis for t in f.data if t.name != "parity"} for f in figures]
+    assert [len(f) for f in facets] == [2, 2, 1]
+    ranges = {tuple(f.layout.xaxis.range) for f in figures}
+    assert len(ranges) == 1
+    specs, _ = spyglass.parityplot(Doubler(), X, X, "train", facet_page_size=2,
+                                   mode="density", bins=5, spec=True, n_jobs=2)
+    assert [s.data.comparison.nunique() for s in specs] == [2, 2, 1]
+    assert len({s.params["extent"] for s in specs}) == 1
+
+def test_parity_metrics():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.random.random(1000), "b": np.random.random(1000)})
+    y = X + np.random.normal(size=X.shape)
+    p, data, metrics = spyglass.parityplot(Doubler(), X[:700], y[:700], "train",
+                                           X[700:], y[700:], "test",
+                                           chunksize=128, metrics="annotate")
+    assert list(metrics.columns) == ["partition", "comparison", "n", "mae", "rmse", "r2", "max_error"]
+    assert len(metrics) == 4
+    for row in metrics.itertuples():
+        d = data[(data.partition == row.partition) & (data.comparison == row.comparison)]
+        error = d.pred - d.true
+        assert row.n == len(d)
+        assert np.isclose(row.mae, error.abs().mean())
+        assert np.isclose(row.rmse, np.sqrt((error**2).mean()))
+        assert np.isclose(row.r2, 1 - (error**2).sum() / ((d.true - d.true.mean())**2).sum())
+        assert np.isclose(row.max_error, error.abs().max())
+    assert sum("MAE" in a.text for a in p.layout.annotations) == 2
+    assert len(spyglass.parityplot(Doubler(), X, y, "all")) == 2
+
+def test_parity_metrics_blocks():
+    from spyglass import _metrics
+    spyglass.set_backend("plotly")
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"a": rng.random(5000) * 1e3, "b": rng.random(5000)})
+    y = X + rng.normal(size=X.shape)
+    y.iloc[::7, 0] = np.nan
+    blocksize, _metrics.BLOCKSIZE = _metrics.BLOCKSIZE, 100
+    try:
+        tables = [spyglass.parityplot(Doubler(), X, y, "all", chunksize=chunksize,
+                                      n_jobs=n_jobs, cache=cache, metrics=True, spec=True)[2]
+                  for chunksize, n_jobs, cache in ((333, None, None), (None, 2, None),
+                                                   (1000, None, True), (1000, None, True))]
+    finally:
+        _metrics.BLOCKSIZE = blocksize
+    error, true = 2 * X.to_numpy() - y.to_numpy(), y.to_numpy()
+    valid = ~np.isnan(true)
+    for j, row in enumerate(tables[0].itertuples()):
+        e, t = error[valid[:, j], j], true[valid[:, j], j]
+        assert row.n == len(e)
+        assert np.isclose(row.mae, np.abs(e).mean()) and np.isclose(row.max_error, np.abs(e).max())
+        assert np.isclose(row.rmse, np.sqrt((e**2).mean()))
+        assert np.isclose(row.r2, 1 - (e**2).sum() / ((t - t.mean())**2).sum())
+    for table in tables[1:]:
+        pd.testing.assert_frame_equal(table, tables[0], check_exact=False)
+
+def test_parity_models():
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.random.random(300), "b": np.random.random(300)})
+    models = {"double": Doubler(), "triple": Scaler(3), "counted": CountingDoubler()}
+    p, data, metrics = spyglass.parityplot(models, X[:200], X[:200], "train",
+                                           X[200:], X[200:], "test",
+                                           n_jobs=2, metrics=True)
+    assert list(data.columns) == ["comparison", "true", "double", "triple", "counted", "partition"]
+    assert len(data) == 600
+    assert np.allclose(data.double, 2 * data.true) and np.allclose(data.triple, 3 * data.true)
+    assert {trace.name for trace in p.data} == {"double", "triple", "counted", "parity"}
+    assert len(metrics) == 12 and set(metrics.model) == set(models)
+    p, _ = spyglass.parityplot(list(models.items()), X, X, "all", mode="density")
+    assert sum(trace.type == "histogram2d" for trace in p.data) == 3 * 2
+    try:
+        spyglass.parityplot({"true": Doubler()}, X, X, "all")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("reserved estimator name accepted")
+
+def test_standalone_threads(plt):
+    from concurrent.futures import ThreadPoolExecutor
+    spyglass.set_backend("seaborn")
+    spyglass.use_pyplot(False)
+    X = pd.DataFrame({"a": np.random.random(200), "b": np.random.random(200)})
+    specs = [spyglass.parityplot(Doubler(), X * (i + 1), X, "all", spec=True,
+                                 mode=("scatter", "density")[i % 2])[0]
+             for i in range(4)]
+    specs.append(spyglass.FigureSpec("scatter_matrix", X))
+    figures = plt.get_fignums()
+    serial = [spec.export("png") for spec in specs]
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(lambda spec: spec.export("png"), specs * 2)) == serial * 2
+    assert plt.get_fignums() == figures
+
+def test_hover_rows():
+    from spyglass._fig_library._sns_fig_library import _hover
+    spyglass.set_backend("seaborn")
+    X = pd.DataFrame({"a": np.random.random(300), "b": np.random.random(300)},
+                     index=[f"row{i}" for i in range(300)])
+    X.iloc[7, 0] = np.nan
+    p, data = spyglass.parityplot(Doubler(), X[:200], X[:200], "train",
+                                  X[200:], X[200:], "test", color="partition")
+    artists = [a for ax in p.figure.axes for a in ax.collections if a in _hover]
+    assert len(artists) == 2
+    for artist in artists:
+        rows, labels = _hover[artist]
+        assert np.allclose(artist.get_offsets(), data[["true", "pred"]].to_numpy()[rows])
+        assert list(labels[rows]) == list(data.index[rows])
+
+def test_plotly_export_options():
+    import json
+    spyglass.set_backend("plotly")
+    X = pd.DataFrame({"a": np.random.random(5000), "b": np.random.random(5000)})
+    spec = spyglass.parityplot({"double": Doubler(), "counted": CountingDoubler()},
+                               X, X, "all", spec=True)[0]
+    default = spec.export("html", include_plotlyjs=False)
+    small = spec.export("html", include_plotlyjs=False, precision="float32")
+    shared = spec.export("html", include_plotlyjs=False, precision="float32", shared_data=True)
+    assert len(shared) < len(small) < len(default)
+    assert len(spec.export("html", include_plotlyjs=False, precision=8)) < len(small)
+    figure = json.loads(spec.export("json", precision="float32", webgl_threshold=100))
+    assert {trace["type"] for trace in figure["data"] if "x" in trace} >= {"scattergl"}
+    assert any(trace["x"].get("dtype") == "f4" for trace in figure["data"]
+               if isinstance(trace.get("x"), dict))
+    try:
+        spec.export("json", precision=16)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("quantized json accepted")
+    figure = spec.render()
+    for options in ({"precision": 16}, {"precision": 8, "shared_data": True},
+                    {"precision": "float32", "shared_data": True}):
+        html = spec.export("html", include_plotlyjs=False, **options).decode()
+        decoded = _decode_page(html)
+        assert len(decoded) == len(figure.data)
+        for trace, original in zip(decoded, figure.data):
+            for k in ("x", "y"):
+                if not isinstance(trace.get(k), tuple):
+                    continue
+                values, step = trace[k]
+                expected = np.asarray(original[k], dtype=float)
+                assert len(values) == len(expected)
+                assert np.allclose(values, expected, atol=step / 2 + 1e-6, equal_nan=True)
+
+def _decode_page(html:str) -> list:
+    """the traces of a compact plotly page, arrays decoded as its loader does, with their step"""
+    import base64, json, re
+    call = re.search(r'spyglassPlot\("[^"]+", (.*)\);\s*</script>', html, re.S).group(1)
+    buffers, specs, figure = json.loads("[" + call + "]")
+    buffers = [base64.b64decode(b) for b in buffers]
+    def view(i):
+        buffer, offset, length, dtype, *quantization = specs[i]
+        a = np.frombuffer(buffers[buffer], dtype=dtype, count=length, offset=offset)
+        if not quantization:
+            return a.astype(float), 1e-6 * np.abs(a).max()
+        low, step = quantization
+        missing = np.iinfo(a.dtype).max
+        return np.where(a == missing, np.nan, low + a * step), step
+    return [{k: view(v["$spyglass"]) if isinstance(v, dict) and "$spyglass" in v else v
+             for k, v in trace.items()} for trace in figure["data"]]
+
+def test_correlation_blocks(tmp_path, plt):
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(1000, 3))
+    X = pd.DataFrame(base[:, [0, 1, 2, 0, 1, 2, 0]] + rng.normal(0, .3, (1000, 7)),
+                     columns=list("abcdefg"))
+    X["name"] = "x"
+    X.iloc[5, 1] = np.nan
+    r = spyglass.correlation(X, chunksize=300, blocksize=2)
+    expected = X.drop(columns="name").fillna(X.mean(numeric_only=True)).corr()
+    assert r.dtypes.iloc[0] == np.float32 and len(r) == 7
+    assert np.allclose(r, expected.loc[r.index, r.columns], atol=1e-5)
+    for group in ("adg", "be", "cf"): #correlated features are adjacent
+        positions = sorted(r.index.get_loc(f) for f in group)
+        assert positions[-1] - positions[0] == len(group) - 1
+    pairs = spyglass.correlation(iter([X[:400], X[400:]]), threshold=.5, blocksize=3)
+    assert len(pairs) == 1 + 1 + 3
+    assert set(pairs.feature_a.cat.categories) == set(r.index)
+    assert (pairs.r.abs() >= .5).all()
+    import glob, tempfile
+    X.to_csv(tmp_path/"X.csv", index=False)
+    spills = set(glob.glob(tempfile.gettempdir() + "/spyglass-*"))
+    reader = pd.read_csv(tmp_path/"X.csv", chunksize=300)
+    assert np.allclose(spyglass.correlation(reader, blocksize=3).loc[r.index, r.columns], r)
+    assert set(glob.glob(tempfile.gettempdir() + "/spyglass-*")) <= spills
+    fig, ax = plt.subplots()
+    im, _, _ = spyglass.corrmap(X, threshold=.5, ax=ax, max_cells=4)
+    assert im.get_array().shape == (4, 4)
+    plt.close(fig)
+    spyglass.use_pyplot(False)
+    figures = plt.get_fignums()
+    im, _, _ = spyglass.corrmap(X, max_cells=4)
+    assert plt.get_fignums() == figures
+    assert im.figure.canvas.__class__.__name__ == "FigureCanvasAgg"